@@ -1,36 +1,119 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, Any
-
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.ensemble import IsolationForest
-
-from .config import SYNTHETIC_DIR
+from concurrent.futures import Future, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+from .anomaly_model import item_robust_stats
+from .config import FORECAST_BATCH_SIZE
+from .dataset_cache import dataset_cache, dataset_version
+from .demand_index import DemandIndex, build_demand_index
+from .ingestion import DemandAggregates, demand_ingestor
+from .model_store import model_store
+from .pagination import After, rank
+from .storage import TABLES, get_store
+
+# statsmodels / sklearn take seconds to import: loaded by the functions that
+# fit models, not when the API starts
+if TYPE_CHECKING:
+    from sklearn.ensemble import IsolationForest
 
 # ======================================================
 # LOADERS
 # ======================================================
 
-def load_inventory() -> pd.DataFrame:
-    return pd.read_csv(SYNTHETIC_DIR / "inventory.csv")
+store = get_store()
+
+
+def current_dataset_version() -> str:
+    """
+    Fingerprint of the four synthetic tables as they currently exist on disk.
+    """
+    return dataset_version(store.identity_path(t) for t in TABLES)
+
+
+def _load(table: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    variant = tuple(columns) if columns is not None else None
+    return dataset_cache.get(
+        store.identity_path(table),
+        lambda: store.read(table, columns),
+        variant=variant,
+    )
+
+
+def load_inventory(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return _load("inventory", columns)
 
 
-def load_demand() -> pd.DataFrame:
-    df = pd.read_csv(SYNTHETIC_DIR / "demand_history.csv", parse_dates=["date"])
-    return df
+def load_demand(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return _load("demand_history", columns)
 
 
-def load_suppliers() -> pd.DataFrame:
-    return pd.read_csv(SYNTHETIC_DIR / "supplier.csv")
+def load_suppliers(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return _load("suppliers", columns)
 
 
-def load_shipments() -> pd.DataFrame:
-    df = pd.read_csv(
-        SYNTHETIC_DIR / "shipments.csv",
-        parse_dates=["date_shipped", "date_received"]
+def load_shipments(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return _load("shipments", columns)
+
+
+DEMAND_INDEX_COLUMNS = ["item_id", "date", "units_sold", "promo_flag", "shrinkage"]
+
+
+def load_demand_index() -> DemandIndex:
+    """
+    Item x day demand index, built once per demand file version.
+    """
+    return dataset_cache.get(
+        store.identity_path("demand_history"),
+        lambda: build_demand_index(load_demand(columns=DEMAND_INDEX_COLUMNS)),
+        variant="demand_index",
     )
-    return df
+
+
+def demand_version() -> str:
+    return dataset_version([store.identity_path("demand_history")])
+
+
+def load_item_robust_stats() -> pd.DataFrame:
+    """
+    Per-item median / robust scale of units_sold, once per demand file version.
+    """
+    return dataset_cache.get(
+        store.identity_path("demand_history"),
+        lambda: item_robust_stats(load_demand(columns=["item_id", "units_sold"])),
+        variant="robust_stats",
+    )
+
+
+def load_demand_matrix():
+    """
+    (item_ids, dates, item x day units matrix) from the demand index.
+    """
+    return load_demand_index().matrix
+
+
+def load_demand_aggregates() -> DemandAggregates:
+    """
+    Running per-item aggregates kept current by demand ingestion.
+    """
+    return demand_ingestor.aggregates(store.identity_path("demand_history"), load_demand_index)
+
+
+def _as_index(demand) -> DemandIndex:
+    # analytics accept either the raw demand table or a prebuilt index
+    return demand if isinstance(demand, DemandIndex) else build_demand_index(demand)
+
+
+def _item_totals(demand, item_ids: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    # per-item totals from aggregates, an index, or the raw demand table
+    if isinstance(demand, DemandAggregates):
+        totals = demand.item_totals()
+    else:
+        totals = _as_index(demand).item_totals()
+    if item_ids is not None:
+        totals = totals[totals["item_id"].isin(item_ids)]
+    return totals
 
 
 # ======================================================
@@ -52,24 +135,26 @@ def analytics_summary(df: pd.DataFrame) -> Dict[str, Any]:
 # INVENTORY & DEMAND ANALYTICS
 # ======================================================
 
-def stockout_risk(inventory: pd.DataFrame, demand: pd.DataFrame) -> pd.DataFrame:
+def stockout_risk(
+    inventory: pd.DataFrame, demand, top_n: Optional[int] = None, after: Optional[After] = None
+) -> pd.DataFrame:
     """
     Estimate days until stockout for each item based on average daily sales.
     Lower days_until_stockout = higher risk.
     """
-    # avg daily demand per item
-    demand_daily = (
-        demand.groupby(["item_id", "date"])["units_sold"]
-        .sum()
-        .groupby("item_id")
-        .mean()
+    totals = _item_totals(demand)
+
+    # avg daily demand per item, over the days the item had demand rows
+    demand_daily = pd.Series(
+        totals["units"].to_numpy() / np.maximum(totals["active_days"].to_numpy(), 1),
+        index=pd.Index(totals["item_id"], name="item_id"),
     )
 
     inv = inventory.merge(demand_daily.rename("avg_daily_units"), on="item_id", how="left")
-    inv["avg_daily_units"].fillna(0.1, inplace=True)  # avoid division by 0
+    inv["avg_daily_units"] = inv["avg_daily_units"].fillna(0.1)  # avoid division by 0
 
     inv["days_until_stockout"] = inv["stock"] / inv["avg_daily_units"]
-    inv = inv.sort_values("days_until_stockout")
+    inv = rank(inv, "days_until_stockout", "item_id", limit=top_n, after=after)
 
     return inv[[
         "item_id", "name", "category", "stock", "reorder_point",
@@ -77,87 +162,177 @@ def stockout_risk(inventory: pd.DataFrame, demand: pd.DataFrame) -> pd.DataFrame
     ]]
 
 
-def excess_inventory(inventory: pd.DataFrame) -> pd.DataFrame:
+def excess_inventory(
+    inventory: pd.DataFrame, top_n: Optional[int] = None, after: Optional[After] = None
+) -> pd.DataFrame:
     """
     Items with stock significantly above their reorder point.
     """
     inv = inventory.copy()
     inv["excess_units"] = inv["stock"] - inv["reorder_point"]
-    inv = inv[inv["excess_units"] > 0].sort_values("excess_units", ascending=False)
+    inv = rank(
+        inv[inv["excess_units"] > 0], "excess_units", "item_id",
+        ascending=False, limit=top_n, after=after
+    )
 
     return inv[[
         "item_id", "name", "category", "stock", "reorder_point", "excess_units"
     ]]
 
 
-def shrinkage_summary(demand: pd.DataFrame) -> pd.DataFrame:
+def shrinkage_summary(
+    demand,
+    top_n: Optional[int] = None,
+    after: Optional[After] = None,
+    item_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
     """
     Shrinkage per item and shrinkage rate.
     """
-    agg = demand.groupby("item_id").agg(
-        total_units_sold=("units_sold", "sum"),
-        total_shrinkage=("shrinkage", "sum")
-    ).reset_index()
+    totals = _item_totals(demand, item_ids)
+
+    agg = pd.DataFrame({
+        "item_id": totals["item_id"],
+        "total_units_sold": totals["units"],
+        "total_shrinkage": totals["shrinkage"],
+    })
 
     agg["shrinkage_rate"] = np.where(
         agg["total_units_sold"] > 0,
-        agg["total_shrinkage"] / agg["total_units_sold"],
+        agg["total_shrinkage"] / agg["total_units_sold"].where(agg["total_units_sold"] > 0, 1),
         0.0
     )
 
-    return agg.sort_values("total_shrinkage", ascending=False)
+    return rank(agg, "total_shrinkage", "item_id", ascending=False, limit=top_n, after=after)
 
 
-def promo_lift(demand: pd.DataFrame) -> pd.DataFrame:
+def promo_lift(
+    demand,
+    top_n: Optional[int] = None,
+    after: Optional[After] = None,
+    item_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
     """
     Measures promo lift per item: (promo_mean - nonpromo_mean) / nonpromo_mean.
     """
-    promo = demand[demand["promo_flag"] == 1].groupby("item_id")["units_sold"].mean()
-    nonpromo = demand[demand["promo_flag"] == 0].groupby("item_id")["units_sold"].mean()
+    totals = _item_totals(demand, item_ids)
 
-    df = pd.DataFrame({
-        "promo_mean": promo,
-        "nonpromo_mean": nonpromo
-    }).dropna()
+    promo_units = totals["promo_units"].to_numpy()
+    promo_rows = totals["promo_rows"].to_numpy()
+    nonpromo_units = totals["units"].to_numpy() - promo_units
+    nonpromo_rows = totals["rows"].to_numpy() - promo_rows
 
-    df["promo_lift"] = (df["promo_mean"] - df["nonpromo_mean"]) / df["nonpromo_mean"]
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
-    df.dropna(subset=["promo_lift"], inplace=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df = pd.DataFrame({
+            "item_id": totals["item_id"].to_numpy(),
+            "promo_mean": np.where(promo_rows > 0, promo_units / promo_rows, np.nan),
+            "nonpromo_mean": np.where(nonpromo_rows > 0, nonpromo_units / nonpromo_rows, np.nan),
+        }).dropna()
 
-    df = df.reset_index().sort_values("promo_lift", ascending=False)
+        df["promo_lift"] = (df["promo_mean"] - df["nonpromo_mean"]) / df["nonpromo_mean"]
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.dropna(subset=["promo_lift"])
+
+    df = rank(df, "promo_lift", "item_id", ascending=False, limit=top_n, after=after)
 
     return df[["item_id", "promo_mean", "nonpromo_mean", "promo_lift"]]
 
 
-def detect_anomalies(demand: pd.DataFrame, contamination: float = 0.02) -> pd.DataFrame:
+ANOMALY_COLUMNS = ["date", "item_id", "units_sold", "channel", "promo_flag", "shrinkage"]
+
+
+def _since(demand: pd.DataFrame, since) -> pd.DataFrame:
+    return demand if since is None else demand[demand["date"] >= pd.Timestamp(since)]
+
+
+def detect_anomalies(
+    demand: pd.DataFrame,
+    contamination: float = 0.02,
+    model: Optional["IsolationForest"] = None,
+    since=None,
+) -> pd.DataFrame:
     """
     Detects demand anomalies using IsolationForest on units_sold.
+    With a prefitted `model` the rows (only those dated >= `since`, if
+    given) are scored without refitting.
     """
-    model = IsolationForest(contamination=contamination, random_state=42)
-    tmp = demand.copy()
-    tmp["anomaly"] = model.fit_predict(tmp[["units_sold"]])
+    rows = _since(demand, since)
+    if rows.empty:
+        return rows[ANOMALY_COLUMNS]
+
+    if model is None:
+        from sklearn.ensemble import IsolationForest
+
+        model = IsolationForest(contamination=contamination, random_state=42)
+        flags = model.fit_predict(rows[["units_sold"]])
+    else:
+        flags = model.predict(rows[["units_sold"]])
+
+    return rows.loc[flags == -1, ANOMALY_COLUMNS]
+
+
+def detect_anomalies_mad(
+    demand: pd.DataFrame,
+    stats: Optional[pd.DataFrame] = None,
+    threshold: float = 3.5,
+    since=None,
+) -> pd.DataFrame:
+    """
+    Per-item contextual anomalies: rows whose robust z-score
+    |units_sold - item median| / item scale exceeds `threshold`.
+    `stats` (see item_robust_stats) default to the full demand history;
+    only rows dated >= `since` are scored.
+    """
+    if stats is None:
+        stats = item_robust_stats(demand)
+    rows = _since(demand, since)
+
+    median = rows["item_id"].map(stats["median"])
+    scale = rows["item_id"].map(stats["scale"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (rows["units_sold"] - median) / scale
+    flagged = (z.abs() > threshold) & (scale > 0)
 
-    anomalies = tmp[tmp["anomaly"] == -1]
-    return anomalies[["date", "item_id", "units_sold", "channel", "promo_flag", "shrinkage"]]
+    out = rows.loc[flagged, ANOMALY_COLUMNS].copy()
+    out["robust_z"] = z[flagged]
+    return out
 
 
 # ======================================================
 # FORECASTING
 # ======================================================
-def forecast_item(demand: pd.DataFrame, item_id: int, periods: int = 7) -> pd.DataFrame:
+def _daily_series(item_rows: pd.DataFrame) -> pd.Series:
+    return (
+        item_rows
+        .sort_values("date")
+        .set_index("date")["units_sold"]
+        .asfreq("D")
+        .fillna(0)
+    )
+
+
+def forecast_item(demand, item_id: int, periods: int = 7) -> pd.DataFrame:
     """
     Robust demand forecasting with ARIMA + fallback handling.
     Ensures a forecast is always returned, even for items with limited history.
     """
 
     # Extract history for this item
-    series = (
-        demand[demand["item_id"] == item_id]
-        .sort_values("date")
-        .set_index("date")["units_sold"]
-        .asfreq("D")
-        .fillna(0)
-    )
+    if isinstance(demand, DemandIndex):
+        pos = demand.positions([item_id])[0]
+        if pos < 0:
+            raise ValueError(f"No demand history for item {item_id}")
+        series = demand.daily_series(pos)
+    else:
+        series = _daily_series(demand[demand["item_id"] == item_id])
+    return forecast_series(series, periods, item_id=item_id)
+
+
+def forecast_series(series: pd.Series, periods: int = 7, item_id: Optional[int] = None) -> pd.DataFrame:
+    """
+    ARIMA forecast (with fallbacks) for one daily units_sold series.
+    With an item_id the fit goes through the persistent model store.
+    """
 
     # ---------------------------------------
     # CASE 1: Not enough history → Fallback
@@ -192,9 +367,14 @@ def forecast_item(demand: pd.DataFrame, item_id: int, periods: int = 7) -> pd.Da
             )
             series = pd.concat([series, padding])
 
-        # Fit ARIMA
-        model = ARIMA(series, order=(2, 1, 2))
-        model_fit = model.fit()
+        # Fit ARIMA (or reuse / update the stored fit for this item)
+        if item_id is not None:
+            model_fit = model_store.fitted(item_id, series)
+        else:
+            from statsmodels.tsa.arima.model import ARIMA
+
+            model = ARIMA(series, order=(2, 1, 2))
+            model_fit = model.fit()
 
         forecast_vals = model_fit.forecast(periods)
 
@@ -217,11 +397,98 @@ def forecast_item(demand: pd.DataFrame, item_id: int, periods: int = 7) -> pd.Da
         })
 
 
+# ------------------------------------------------------
+# BATCH FORECASTING
+# ------------------------------------------------------
+
+def item_series(demand, item_ids: Optional[Sequence[int]] = None) -> Dict[int, Any]:
+    """
+    Daily series per item, sliced from the demand index (or from one
+    groupby pass over a raw demand table). Items whose history cannot be
+    turned into a daily series map to the exception instead.
+    """
+    out: Dict[int, Any] = {}
+
+    if isinstance(demand, DemandIndex):
+        ids = demand.item_ids if item_ids is None else np.asarray(item_ids)
+        for item_id, pos in zip(ids.tolist(), demand.positions(ids).tolist()):
+            if pos < 0:
+                out[int(item_id)] = ValueError(f"No demand history for item {item_id}")
+            else:
+                out[int(item_id)] = demand.daily_series(pos)
+        return out
+
+    if item_ids is not None:
+        demand = demand[demand["item_id"].isin(item_ids)]
+
+    for item_id, rows in demand.groupby("item_id", sort=True):
+        try:
+            out[int(item_id)] = _daily_series(rows)
+        except Exception as e:
+            out[int(item_id)] = e
+
+    for item_id in item_ids or []:
+        out.setdefault(int(item_id), ValueError(f"No demand history for item {item_id}"))
+    return out
+
+
+def _forecast_batch(batch: List[Tuple[int, pd.Series]], periods: int) -> List[Tuple[int, Any]]:
+    results = []
+    for item_id, series in batch:
+        try:
+            results.append((item_id, forecast_series(series, periods, item_id=item_id)))
+        except Exception as e:
+            results.append((item_id, e))
+    return results
+
+
+def forecast_items(
+    demand,
+    item_ids: Optional[Sequence[int]] = None,
+    periods: int = 7,
+    submit: Optional[Callable[..., Future]] = None,
+    batch_size: int = FORECAST_BATCH_SIZE,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Forecasts many items (all items when item_ids is None), yielding
+    (item_id, forecast DataFrame or exception) as batches of `batch_size`
+    items complete. With `submit` (e.g. analytics_executor.submit) the
+    batches run in parallel and order follows completion, not item_id;
+    without it they run here, one after another.
+    """
+    series = item_series(demand, item_ids)
+
+    ready = [(i, s) for i, s in series.items() if not isinstance(s, Exception)]
+    for item_id, err in series.items():
+        if isinstance(err, Exception):
+            yield item_id, err
+
+    batches = [ready[i:i + batch_size] for i in range(0, len(ready), batch_size)]
+    if submit is None or len(batches) <= 1:
+        for batch in batches:
+            yield from _forecast_batch(batch, periods)
+        return
+
+    futures = [submit(_forecast_batch, batch, periods) for batch in batches]
+    try:
+        for fut in as_completed(futures):
+            yield from fut.result()
+    finally:
+        # also runs when the consumer stops early (e.g. client disconnect)
+        for fut in futures:
+            fut.cancel()
+
+
 # ======================================================
 # SUPPLIER & SHIPMENT ANALYTICS
 # ======================================================
 
-def supplier_risk(suppliers: pd.DataFrame) -> pd.DataFrame:
+def supplier_risk(
+    suppliers: pd.DataFrame,
+    top_n: Optional[int] = None,
+    after: Optional[After] = None,
+    supplier_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
     """
     Composite supplier risk score using on_time_rate, defect_rate, and lead_time_days.
     Higher score = riskier supplier.
@@ -238,7 +505,10 @@ def supplier_risk(suppliers: pd.DataFrame) -> pd.DataFrame:
         sup["lead_time_norm"] * 0.2
     )
 
-    sup = sup.sort_values("risk_score", ascending=False)
+    # filter after scoring: lead times are normalized over all suppliers
+    if supplier_ids is not None:
+        sup = sup[sup["supplier_id"].isin(supplier_ids)]
+    sup = rank(sup, "risk_score", "supplier_id", ascending=False, limit=top_n, after=after)
 
     return sup[[
         "supplier_id", "supplier_name", "on_time_rate",
@@ -246,7 +516,9 @@ def supplier_risk(suppliers: pd.DataFrame) -> pd.DataFrame:
     ]]
 
 
-def shipment_delay_summary(shipments: pd.DataFrame) -> pd.DataFrame:
+def shipment_delay_summary(
+    shipments: pd.DataFrame, top_n: Optional[int] = None, after: Optional[After] = None
+) -> pd.DataFrame:
     """
     Computes transit time per shipment and highlights slow shipments.
     """
@@ -255,4 +527,4 @@ def shipment_delay_summary(shipments: pd.DataFrame) -> pd.DataFrame:
 
     summary = shp[["shipment_id", "item_id", "supplier_id", "qty", "date_shipped", "date_received", "transit_days"]]
 
-    return summary.sort_values("transit_days", ascending=False)
+    return rank(summary, "transit_days", "shipment_id", ascending=False, limit=top_n, after=after)
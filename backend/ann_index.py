@@ -0,0 +1,280 @@
+#%%
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    RAG_INDEX_TYPE,
+    RAG_VECTOR_DTYPE,
+    RAG_HNSW_M,
+    RAG_HNSW_EF_CONSTRUCTION,
+    RAG_HNSW_EF_SEARCH,
+    RAG_IVF_NLIST,
+    RAG_IVF_NPROBE,
+    RAG_PQ_M,
+    RAG_PQ_NBITS,
+    RAG_TRAIN_SIZE,
+)
+from .lazy import lazy_import
+
+faiss = lazy_import("faiss")
+
+# ======================================================
+# ANN INDEX TYPES
+# ======================================================
+#
+# Index types, all addressed by stable doc ids:
+#   flat      IndexFlatL2      exact scan, O(n) per query
+#   hnsw      IndexHNSWFlat    graph search, tuned by efSearch; no removals
+#   ivf_flat  IndexIVFFlat     inverted lists, tuned by nprobe; trained
+#   ivf_pq    IndexIVFPQ       as ivf_flat with PQ-compressed vectors
+#
+# ivf_pq sizes its codebooks (2^nbits centroids per sub-quantizer) from the
+# training set; below 39 * 2^PQ_MIN_NBITS training vectors PQ codebooks are
+# too coarse to be useful and an ivf_flat index is built instead.
+#
+# flat / hnsw / ivf_flat store vectors as float32, or scalar-quantized to
+# float16 / int8 (IndexScalarQuantizer, IndexHNSWSQ, IndexIVFScalarQuantizer);
+# int8 is trained (per-dimension ranges) like IVF.
+#
+# flat / hnsw are wrapped in an IndexIDMap2. IVF indexes store the ids
+# themselves (IndexIDMap2 can't track IVF removals) and keep a hashtable
+# direct map so vectors can be reconstructed by id.
+#
+# Search parameters are passed per query (faiss SearchParameters), so
+# concurrent queries with different efSearch / nprobe don't interfere.
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+TRAINED_TYPES = ("ivf_flat", "ivf_pq")
+REMOVABLE_TYPES = ("flat", "ivf_flat", "ivf_pq")
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+_KIND_OF_CLASS = {
+    "IndexFlatL2": "flat",
+    "IndexFlat": "flat",
+    "IndexScalarQuantizer": "flat",
+    "IndexHNSWFlat": "hnsw",
+    "IndexHNSWSQ": "hnsw",
+    "IndexIVFFlat": "ivf_flat",
+    "IndexIVFScalarQuantizer": "ivf_flat",
+    "IndexIVFPQ": "ivf_pq",
+}
+
+# smallest useful PQ codebook: 2^4 centroids per sub-quantizer
+PQ_MIN_NBITS = 4
+
+# faiss.ScalarQuantizer attribute per stored dtype
+_QTYPES = {"float16": "QT_fp16", "int8": "QT_8bit"}
+
+
+def _nlist(n_train: int) -> int:
+    nlist = RAG_IVF_NLIST or int(4 * np.sqrt(n_train))
+    # k-means wants ~39 training points per centroid
+    return int(np.clip(nlist, 1, max(n_train // 39, 1)))
+
+
+def _pq_nbits(n_train: int) -> int:
+    # as for nlist: ~39 training points per codebook centroid
+    return min(RAG_PQ_NBITS, int(np.log2(n_train / 39))) if n_train >= 39 else 0
+
+
+def _pq_m(dim: int) -> int:
+    m = RAG_PQ_M or max(dim // 8, 1)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def index_spec(
+    kind: str = RAG_INDEX_TYPE, dtype: str = RAG_VECTOR_DTYPE, n_train: Optional[int] = None
+) -> Tuple[str, str]:
+    """
+    (kind, dtype) as index_kind / index_dtype report them for an index
+    built with these settings from n_train training vectors (ivf_pq falls
+    back to ivf_flat on too few).
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}', expected one of {VECTOR_DTYPES}")
+    if kind == "ivf_pq":
+        if n_train is not None and _pq_nbits(n_train) < PQ_MIN_NBITS:
+            kind = "ivf_flat"
+        dtype = "float32"
+    return kind, dtype
+
+
+def make_index(
+    kind: str, dim: int, n_train: int = 0, dtype: str = RAG_VECTOR_DTYPE
+) -> "faiss.Index":
+    """
+    Untrained base index of `kind` storing `dtype` vectors; n_train sizes
+    the IVF coarse quantizer.
+    """
+    kind, dtype = index_spec(kind, dtype, n_train)
+    qtype = getattr(faiss.ScalarQuantizer, _QTYPES[dtype]) if dtype in _QTYPES else None
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim) if qtype is None else faiss.IndexScalarQuantizer(dim, qtype)
+    if kind == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, RAG_HNSW_M)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, RAG_HNSW_M)
+        index.hnsw.efConstruction = RAG_HNSW_EF_CONSTRUCTION
+        return index
+    if kind == "ivf_flat":
+        if qtype is not None:
+            return faiss.IndexIVFScalarQuantizer(
+                faiss.IndexFlatL2(dim), dim, _nlist(n_train), qtype
+            )
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, _nlist(n_train))
+    if kind == "ivf_pq":
+        return faiss.IndexIVFPQ(
+            faiss.IndexFlatL2(dim), dim, _nlist(n_train), _pq_m(dim), _pq_nbits(n_train)
+        )
+    raise ValueError(f"Unknown index type '{kind}', expected one of {INDEX_TYPES}")
+
+
+def _base(index: "faiss.Index") -> "faiss.Index":
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def index_kind(index: "faiss.Index") -> str:
+    """
+    Type name ("flat", "hnsw", ...) of an index, looking through IndexIDMap2.
+    """
+    return _KIND_OF_CLASS.get(type(_base(index)).__name__, "unknown")
+
+
+def index_dtype(index: "faiss.Index") -> str:
+    """
+    Stored vector precision: "float32", "float16" or "int8" ("float32" for
+    ivf_pq, whose codes aren't a plain dtype).
+    """
+    base = _base(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    sq = getattr(base, "sq", None)
+    if sq is None:
+        return "float32"
+    for dtype, name in _QTYPES.items():
+        if sq.qtype == getattr(faiss.ScalarQuantizer, name):
+            return dtype
+    return "unknown"
+
+
+def matches_spec(
+    index: "faiss.Index", kind: str = RAG_INDEX_TYPE, dtype: str = RAG_VECTOR_DTYPE
+) -> bool:
+    """
+    Whether `index` is what IndexBuilder would build for its size with
+    these settings.
+    """
+    n_train = min(index.ntotal, RAG_TRAIN_SIZE)
+    return (index_kind(index), index_dtype(index)) == index_spec(kind, dtype, n_train)
+
+
+def reconstruct(index: "faiss.Index", ids: np.ndarray) -> np.ndarray:
+    """
+    Stored vectors for doc `ids` (approximate for ivf_pq).
+    """
+    if index_kind(index) in TRAINED_TYPES and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+
+def search_params(
+    kind: str, ef_search: Optional[int] = None, nprobe: Optional[int] = None
+) -> Optional["faiss.SearchParameters"]:
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or RAG_HNSW_EF_SEARCH)
+    if kind in TRAINED_TYPES:
+        return faiss.SearchParametersIVF(nprobe=nprobe or RAG_IVF_NPROBE)
+    return None
+
+
+def search(
+    index: "faiss.Index",
+    queries: np.ndarray,
+    k: int,
+    ef_search: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    ids: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (distances, doc ids) of the k nearest vectors, only among `ids` if given.
+    """
+    params = search_params(index_kind(index), ef_search, nprobe)
+    if ids is not None:
+        selector = faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64))
+        params = params or faiss.SearchParameters()
+        params.sel = selector
+    return index.search(np.asarray(queries, dtype=np.float32), k, params=params)
+
+
+def index_bytes(index: "faiss.Index") -> int:
+    """
+    Serialized size: vectors / codes plus graph or inverted-list overhead.
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+# ======================================================
+# BUILDER
+# ======================================================
+
+class IndexBuilder:
+    """
+    Accumulates (ids, vectors) batches into an index of `kind`.
+    Trained types (IVF, int8) buffer the first `train_size` vectors, train
+    on them, then add everything; others add as batches arrive.
+    """
+
+    def __init__(
+        self,
+        kind: str = RAG_INDEX_TYPE,
+        train_size: int = RAG_TRAIN_SIZE,
+        dtype: str = RAG_VECTOR_DTYPE,
+    ):
+        self.kind, self.dtype = index_spec(kind, dtype)
+        self.trained = self.kind in TRAINED_TYPES or self.dtype == "int8"
+        self.train_size = train_size
+        self.index: Optional["faiss.Index"] = None
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending_rows = 0
+
+    def _start(self):
+        vectors = np.concatenate([v for _, v in self._pending])
+        ids = np.concatenate([i for i, _ in self._pending])
+        n_train = min(len(vectors), self.train_size)
+        # what actually gets built (ivf_pq may fall back to ivf_flat)
+        self.kind, self.dtype = index_spec(self.kind, self.dtype, n_train)
+        base = make_index(self.kind, vectors.shape[1], n_train, self.dtype)
+        if not base.is_trained:
+            base.train(vectors[:self.train_size])
+        if self.kind in TRAINED_TYPES:
+            base.set_direct_map_type(faiss.DirectMap.Hashtable)
+            self.index = base
+        else:
+            self.index = faiss.IndexIDMap2(base)
+        self.index.add_with_ids(vectors, ids)
+        self._pending, self._pending_rows = [], 0
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.index is not None:
+            self.index.add_with_ids(vectors, ids)
+            return
+        self._pending.append((ids, vectors))
+        self._pending_rows += len(ids)
+        if not self.trained or self._pending_rows >= self.train_size:
+            self._start()
+
+    def finish(self) -> Optional["faiss.Index"]:
+        if self.index is None and self._pending:
+            self._start()
+        return self.index
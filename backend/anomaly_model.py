@@ -0,0 +1,107 @@
+#%%
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import ANOMALY_MODEL_PATH, ANOMALY_SAMPLE_ROWS
+
+# sklearn / joblib are imported when a model is first needed
+if TYPE_CHECKING:
+    from sklearn.ensemble import IsolationForest
+
+# ======================================================
+# PERSISTENT ANOMALY MODEL
+# ======================================================
+#
+# The IsolationForest is fitted once per demand dataset version, on at most
+# ANOMALY_SAMPLE_ROWS sampled rows, and persisted with that version. Requests
+# then only score the rows they ask for.
+
+FEATURES = ["units_sold"]
+
+
+class AnomalyModelStore:
+    def __init__(
+        self,
+        path: Path = ANOMALY_MODEL_PATH,
+        sample_rows: int = ANOMALY_SAMPLE_ROWS,
+        contamination: float = 0.02,
+    ):
+        self.path = Path(path)
+        self.sample_rows = sample_rows
+        self.contamination = contamination
+        self._version: Optional[str] = None
+        self._model: Optional["IsolationForest"] = None
+        self._lock = threading.Lock()
+        self.fits = 0
+
+    def model(self, version: str, demand: pd.DataFrame) -> "IsolationForest":
+        """
+        Fitted model for `version`: from memory, else from disk, else
+        fitted on a sample of `demand` and persisted.
+        """
+        import joblib
+        from sklearn.ensemble import IsolationForest
+
+        with self._lock:
+            if self._version == version and self._model is not None:
+                return self._model
+
+            try:
+                saved = joblib.load(self.path)
+                if saved["version"] == version and saved["contamination"] == self.contamination:
+                    self._version, self._model = version, saved["model"]
+                    return self._model
+            except Exception:
+                # missing, truncated or unreadable: refit (and overwrite) below
+                pass
+
+            train = demand[FEATURES]
+            if len(train) > self.sample_rows:
+                train = train.sample(n=self.sample_rows, random_state=42)
+            model = IsolationForest(contamination=self.contamination, random_state=42)
+            model.fit(train)
+            self.fits += 1
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # per-process temp name: the API and analytics workers may fit at once
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            joblib.dump(
+                {"version": version, "contamination": self.contamination, "model": model}, tmp
+            )
+            tmp.replace(self.path)
+
+            self._version, self._model = version, model
+            return model
+
+    def stats(self):
+        return {"version": self._version, "fits": self.fits, "sample_rows": self.sample_rows}
+
+
+# ======================================================
+# PER-ITEM ROBUST STATISTICS
+# ======================================================
+
+def item_robust_stats(demand: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per item: median of units_sold and its scale (MAD * 1.4826, falling
+    back to 1.2533 * mean absolute deviation when the MAD is zero).
+    """
+    grouped = demand.groupby("item_id")["units_sold"]
+    median = grouped.median()
+    deviation = (demand["units_sold"] - demand["item_id"].map(median)).abs()
+    dev_grouped = deviation.groupby(demand["item_id"])
+
+    mad = dev_grouped.median() * 1.4826
+    meanad = dev_grouped.mean() * 1.2533
+    scale = mad.where(mad > 0, meanad)
+
+    return pd.DataFrame({"median": median, "scale": scale})
+
+
+# Singleton instance
+anomaly_store = AnomalyModelStore()
@@ -1,28 +1,57 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 import pandas as pd
+from datetime import date
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from .data_generator import save_synthetic_data
+from . import jobs
+from .config import GZIP_MIN_BYTES, RAG_REBUILD_ON_DATA_CHANGE, WARMUP_ON_STARTUP
+from .data_generator import append_table, save_synthetic_data
 from .analytics import (
-    load_inventory,
-    load_demand,
-    load_suppliers,
-    load_shipments,
-    analytics_summary,
-    stockout_risk,
-    excess_inventory,
-    shrinkage_summary,
-    promo_lift,
-    detect_anomalies,
-    forecast_item,
-    supplier_risk,
-    shipment_delay_summary,
+    forecast_items,
+    load_demand_index,
+    load_demand_matrix,
+    store,
 )
+from .dataset_cache import dataset_cache, file_identity
+from .executor import analytics_executor
+from .ingestion import DEMAND_COLUMNS, SHIPMENT_COLUMNS, demand_ingestor
+from .fast_forecast import fast_forecast
+from .llm import llm_backend
+from .model_store import model_store
+from .pagination import decode_cursor, encode_cursor
 from .rag_engine import rag_engine
-from .models import AnalyticsSummaryResponse, RAGQueryRequest, RAGQueryResponse
+from .serialization import columns_of, dumps, negotiate, records_of, render
+from .storage import table_lock
+from .startup import start_warm_up, startup_stats
+from .summaries import summary_engine
+from .models import (
+    AnalyticsSummaryResponse,
+    DemandIngestRequest,
+    ForecastBatchRequest,
+    RAGQueryRequest,
+    RAGQueryResponse,
+    ShipmentIngestRequest,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the persisted RAG index, embedding model and model-fitting libraries
+    # load on a background thread, so startup (and /health) doesn't wait;
+    # without warm-up the first request that needs them loads them
+    if WARMUP_ON_STARTUP:
+        start_warm_up()
+    yield
+    analytics_executor.shutdown()
+    if llm_backend is not None:
+        await llm_backend.aclose()
 
 
-app = FastAPI(title="Retail SupplyChainIQ API", version="1.0")
+app = FastAPI(title="Retail SupplyChainIQ API", version="1.0", lifespan=lifespan)
 
 # CORS so Streamlit frontend can talk to this
 app.add_middleware(
@@ -30,7 +59,9 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
 
 
 # ======================================================
@@ -41,102 +72,354 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Hit/miss/reload counters of the dataset cache - in this process (thread
+    jobs, RAG) and summed over the analytics worker processes - plus
+    build/extend counters for the table summary sketches and computed /
+    coalesced counters for the analytics executor, hit rates of the
+    /rag/query embedding and answer caches and the LLM backend's retries.
+    """
+    return {
+        "dataset_cache": {
+            "api_process": dataset_cache.stats(),
+            "workers": analytics_executor.worker_stats()["dataset_cache"],
+        },
+        "summaries": summary_engine.stats(),
+        "executor": analytics_executor.stats(),
+        "rag": rag_engine.cache_stats(),
+    }
+
+
 # ======================================================
 # DATA GENERATION
 # ======================================================
 @app.post("/data/generate")
-def generate_data():
+def generate_data(
+    mode: str = "rows",
+    n_rows: int = 5000,
+    n_items: int = 5000,
+    n_suppliers: int = 5000,
+    seed: Optional[int] = None,
+    end_date: Optional[date] = None,
+    chunk_rows: Optional[int] = None,
+    workers: Optional[int] = None,
+):
     """
-    Generates all 4 synthetic tables (5000 rows each):
+    Generates all 4 synthetic tables (5000 rows each by default):
     - inventory.csv
     - demand_history.csv
     - supplier.csv
     - shipments.csv
+
+    mode="vectorized" uses the seeded NumPy generator (same seed and
+    end_date -> same files; end_date, the last demand / shipment date,
+    defaults to today).
+    mode="streaming" generates and writes chunk_rows rows at a time across a
+    process pool; each chunk has its own seeded stream, so output is
+    deterministic for a given seed, end_date and chunk_rows, whatever the
+    worker count, but differs from mode="vectorized" once there are several
+    chunks.
+    The RAG index is then rebuilt in the background; queries are answered
+    from the previous one until it is ready.
     """
-    paths = save_synthetic_data()
+    stream_kwargs = {}
+    if mode == "streaming":
+        if chunk_rows is not None:
+            stream_kwargs["chunk_rows"] = chunk_rows
+        if workers is not None:
+            stream_kwargs["workers"] = workers
+    try:
+        paths = save_synthetic_data(
+            mode=mode, n_rows=n_rows, n_items=n_items, n_suppliers=n_suppliers, seed=seed,
+            end_date=end_date, **stream_kwargs
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if RAG_REBUILD_ON_DATA_CHANGE:
+        rag_engine.request_rebuild("data/generate")
     return {"message": "Synthetic data generated.", "paths": paths}
 
 
+# ======================================================
+# INGESTION
+# ======================================================
+
+def _append(table: str, rows: pd.DataFrame):
+    # append, then fold the rows into the table's summary sketches; one
+    # table lock around both so `before` is the file this append extended
+    path = store.identity_path(table)
+    with table_lock(table):
+        before = file_identity(path) if path.exists() else None
+        append_table(table, rows)
+        summary_engine.extend(table, rows, before)
+
+
+@app.post("/ingest/demand")
+def ingest_demand(req: DemandIngestRequest):
+    """
+    Appends a batch of demand rows and folds them into the running
+    per-item aggregates used by stockout / promo / shrinkage analytics.
+    """
+    rows = pd.DataFrame([r.model_dump() for r in req.rows], columns=DEMAND_COLUMNS)
+    return demand_ingestor.ingest(
+        rows,
+        store.identity_path("demand_history"),
+        append=lambda df: _append("demand_history", df),
+        build_index=load_demand_index,
+    )
+
+
+@app.post("/ingest/shipments")
+def ingest_shipments(req: ShipmentIngestRequest):
+    rows = pd.DataFrame([r.model_dump() for r in req.rows], columns=SHIPMENT_COLUMNS)
+    for col in ("date_shipped", "date_received"):
+        rows[col] = pd.to_datetime(rows[col])
+    _append("shipments", rows)
+    return {"rows": len(rows)}
+
+
 # ======================================================
 # SUMMARY ENDPOINTS
 # ======================================================
+#
+# Served from streaming sketches built once per table version: counts,
+# means, std, min/max and null counts are exact; quantiles (KLL), unique
+# (HyperLogLog) and top/freq (Misra-Gries) are approximate. The sketches
+# live in this process, so builds run in a thread rather than the pool.
+
+async def _summary(table: str) -> AnalyticsSummaryResponse:
+    summary = await analytics_executor.run(
+        f"summary:{table}", summary_engine.summary, table, process=False
+    )
+    return AnalyticsSummaryResponse(**summary)
+
 
 @app.get("/analytics/inventory-summary", response_model=AnalyticsSummaryResponse)
-def inventory_summary():
-    df = load_inventory()
-    summary = analytics_summary(df)
-    return AnalyticsSummaryResponse(**summary)
+async def inventory_summary():
+    return await _summary("inventory")
 
 
 @app.get("/analytics/demand-summary", response_model=AnalyticsSummaryResponse)
-def demand_summary():
-    df = load_demand()
-    summary = analytics_summary(df)
-    return AnalyticsSummaryResponse(**summary)
+async def demand_summary():
+    return await _summary("demand_history")
 
 
 @app.get("/analytics/supplier-summary", response_model=AnalyticsSummaryResponse)
-def supplier_summary():
-    df = load_suppliers()
-    summary = analytics_summary(df)
-    return AnalyticsSummaryResponse(**summary)
+async def supplier_summary():
+    return await _summary("suppliers")
 
 
 @app.get("/analytics/shipments-summary", response_model=AnalyticsSummaryResponse)
-def shipments_summary():
-    df = load_shipments()
-    summary = analytics_summary(df)
-    return AnalyticsSummaryResponse(**summary)
+async def shipments_summary():
+    return await _summary("shipments")
 
 
 # ======================================================
 # INVENTORY / DEMAND ANALYTICS
 # ======================================================
+#
+# Handlers decode their inputs, then run the matching backend.jobs
+# function on analytics_executor (worker processes, with identical
+# concurrent requests coalesced) and render the result.
+
+def _after(cursor: Optional[str], by: Optional[str]):
+    try:
+        return decode_cursor(cursor, by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _format(format: Optional[str] = None, accept: Optional[str] = Header(None)) -> str:
+    """
+    Response format of a table endpoint: ?format=json|columns|ndjson|arrow|parquet,
+    else negotiated from the Accept header (records JSON by default).
+    """
+    try:
+        return negotiate(format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def _page(fmt: str, df: pd.DataFrame, by: Optional[str], key: Optional[str], top_n: int):
+    """
+    One page in the requested format; a full page carries the next page's
+    cursor in the X-Next-Cursor header.
+    """
+    headers = {}
+    if len(df) >= top_n:
+        cursor = encode_cursor(df, by, key)
+        if cursor:
+            headers["X-Next-Cursor"] = cursor
+    return render(df, fmt, headers)
+
+
+async def _run(endpoint: str, fn, *args):
+    try:
+        return await analytics_executor.run(endpoint, fn, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @app.get("/analytics/stockout-risk")
-def get_stockout_risk(top_n: int = 20):
-    inv = load_inventory()
-    demand = load_demand()
-    df = stockout_risk(inv, demand).head(top_n)
-    return df.to_dict(orient="records")
+async def get_stockout_risk(
+    top_n: int = 20, cursor: Optional[str] = None, category: Optional[str] = None,
+    fmt: str = Depends(_format),
+):
+    by = "days_until_stockout"
+    df = await _run("stockout-risk", jobs.stockout_page, top_n, _after(cursor, by), category)
+    return _page(fmt, df, by, "item_id", top_n)
 
 
 @app.get("/analytics/excess-inventory")
-def get_excess_inventory(top_n: int = 20):
-    inv = load_inventory()
-    df = excess_inventory(inv).head(top_n)
-    return df.to_dict(orient="records")
+async def get_excess_inventory(
+    top_n: int = 20, cursor: Optional[str] = None, category: Optional[str] = None,
+    fmt: str = Depends(_format),
+):
+    by = "excess_units"
+    df = await _run("excess-inventory", jobs.excess_page, top_n, _after(cursor, by), category)
+    return _page(fmt, df, by, "item_id", top_n)
 
 
 @app.get("/analytics/shrinkage")
-def get_shrinkage(top_n: int = 20):
-    demand = load_demand()
-    df = shrinkage_summary(demand).head(top_n)
-    return df.to_dict(orient="records")
+async def get_shrinkage(
+    top_n: int = 20, cursor: Optional[str] = None, category: Optional[str] = None,
+    fmt: str = Depends(_format),
+):
+    by = "total_shrinkage"
+    df = await _run("shrinkage", jobs.shrinkage_page, top_n, _after(cursor, by), category)
+    return _page(fmt, df, by, "item_id", top_n)
 
 
 @app.get("/analytics/promo-lift")
-def get_promo_lift(top_n: int = 20):
-    demand = load_demand()
-    df = promo_lift(demand).head(top_n)
-    return df.to_dict(orient="records")
+async def get_promo_lift(
+    top_n: int = 20, cursor: Optional[str] = None, category: Optional[str] = None,
+    fmt: str = Depends(_format),
+):
+    by = "promo_lift"
+    df = await _run("promo-lift", jobs.promo_lift_page, top_n, _after(cursor, by), category)
+    return _page(fmt, df, by, "item_id", top_n)
 
 
 @app.get("/analytics/anomalies")
-def get_anomalies():
-    demand = load_demand()
-    df = detect_anomalies(demand)
-    return df.to_dict(orient="records")
+async def get_anomalies(
+    mode: str = "isolation",
+    since: Optional[date] = None,
+    top_n: int = 500,
+    cursor: Optional[str] = None,
+    item_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fmt: str = Depends(_format),
+):
+    """
+    Anomalous demand rows in table order, `top_n` per page.
+    mode="isolation": persisted IsolationForest (fitted once per dataset version)
+    mode="mad": per-item robust z-score against each item's own history
+    Only rows dated >= `since` are scored.
+    """
+    df = await _run(
+        "anomalies", jobs.anomalies_page,
+        mode, since, top_n, _after(cursor, None), item_id, start_date, end_date,
+    )
+    return _page(fmt, df, None, None, top_n)
 
 
 @app.get("/analytics/forecast")
-def get_forecast(item_id: int, periods: int = 7):
-    demand = load_demand()
+async def get_forecast(
+    item_id: int, periods: int = 7, method: str = "arima", fmt: str = Depends(_format)
+):
+    """
+    method="arima" fits the item on its own; any of FAST_METHODS
+    (ses, holt, croston, sba, seasonal_naive, auto) uses the vectorized engine.
+    """
     try:
-        df = forecast_item(demand, item_id, periods)
+        df = await analytics_executor.run("forecast", jobs.forecast_one, item_id, periods, method)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return df.to_dict(orient="records")
+    return render(df, fmt)
+
+
+@app.get("/analytics/forecast/accuracy")
+async def get_forecast_accuracy(holdout: int = 7, arima_sample: int = 100):
+    """
+    MAE/RMSE of each vectorized method against ARIMA on the last `holdout` days.
+    """
+    if holdout < 1:
+        raise HTTPException(status_code=400, detail="holdout must be at least 1 day")
+    return await _run("forecast-accuracy", jobs.forecast_accuracy, holdout, arima_sample)
+
+
+@app.get("/analytics/forecast/model-store")
+def forecast_model_store_stats():
+    """
+    Reuse / update / fit counters of the fitted-model store, in this
+    process and summed over the analytics worker processes (which run the
+    fits); on_disk is the shared store's file count.
+    """
+    workers = analytics_executor.worker_stats()
+    return {
+        "api_process": model_store.stats(),
+        "workers": workers["model_store"],
+        "workers_reporting": workers["workers_reporting"],
+    }
+
+@app.post("/analytics/forecast/batch")
+def forecast_batch(req: ForecastBatchRequest):
+    """
+    Forecasts a list of items (or "all") and streams one NDJSON line per
+    item. ARIMA fits run in parallel and stream as they complete; the
+    vectorized methods forecast the whole catalog in one pass.
+    """
+    item_ids = None if req.item_ids == "all" else req.item_ids
+
+    if req.method != "arima":
+        # whole catalog in one vectorized pass; nothing to fan out
+        try:
+            df = fast_forecast(load_demand_matrix(), req.method, req.periods, item_ids=item_ids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # rows come out item-major, `periods` rows per item
+        ids = df["item_id"].to_numpy()[::req.periods].tolist()
+        values = df["forecast_units"].to_numpy().reshape(-1, req.periods).tolist()
+        dates = columns_of(df[["date"]].iloc[:req.periods])["date"]
+        # ids without history: one error line each, as on the ARIMA path
+        known = set(ids)
+        missing = [i for i in dict.fromkeys(item_ids or ()) if i not in known]
+
+        def fast_lines():
+            for item_id in missing:
+                error = f"No demand history for item {item_id}"
+                yield dumps({"item_id": item_id, "error": error}) + b"\n"
+            for item_id, vals in zip(ids, values):
+                forecast = [{"date": d, "forecast_units": v} for d, v in zip(dates, vals)]
+                yield dumps({"item_id": item_id, "forecast": forecast}) + b"\n"
+
+        return StreamingResponse(fast_lines(), media_type="application/x-ndjson")
+
+    index = load_demand_index()
+
+    def lines():
+        # ARIMA batches fan out over the long-lived (spawn) analytics pool
+        submit = analytics_executor.submit if analytics_executor.workers > 0 else None
+        for item_id, result in forecast_items(index, item_ids, req.periods, submit=submit):
+            if isinstance(result, Exception):
+                row = {"item_id": item_id, "error": str(result)}
+            else:
+                row = {"item_id": item_id, "forecast": records_of(result)}
+            # same encoding as the vectorized path
+            yield dumps(row) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/analytics/daily-demand")
+async def get_daily_demand(fmt: str = Depends(_format)):
+    """
+    Total units sold per day across all items.
+    """
+    return render(await _run("daily-demand", jobs.daily_demand), fmt)
 
 
 # ======================================================
@@ -144,28 +427,97 @@ def get_forecast(item_id: int, periods: int = 7):
 # ======================================================
 
 @app.get("/analytics/supplier-risk")
-def get_supplier_risk(top_n: int = 20):
-    suppliers = load_suppliers()
-    df = supplier_risk(suppliers).head(top_n)
-    return df.to_dict(orient="records")
+async def get_supplier_risk(
+    top_n: int = 20, cursor: Optional[str] = None, supplier_id: Optional[int] = None,
+    fmt: str = Depends(_format),
+):
+    by = "risk_score"
+    df = await _run("supplier-risk", jobs.supplier_risk_page, top_n, _after(cursor, by), supplier_id)
+    return _page(fmt, df, by, "supplier_id", top_n)
 
 
 @app.get("/analytics/shipment-delays")
-def get_shipment_delays(top_n: int = 50):
-    shipments = load_shipments()
-    df = shipment_delay_summary(shipments).head(top_n)
-    return df.to_dict(orient="records")
+async def get_shipment_delays(
+    top_n: int = 50,
+    cursor: Optional[str] = None,
+    supplier_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fmt: str = Depends(_format),
+):
+    """
+    Slowest shipments first; start_date / end_date filter on date_shipped.
+    """
+    by = "transit_days"
+    df = await _run(
+        "shipment-delays", jobs.shipment_delays_page,
+        top_n, _after(cursor, by), supplier_id, start_date, end_date,
+    )
+    return _page(fmt, df, by, "shipment_id", top_n)
 
 
 # ======================================================
 # RAG: AI SUPPLY CHAIN ANALYST
 # ======================================================
 
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
 @app.post("/rag/query", response_model=RAGQueryResponse)
-def rag_query(req: RAGQueryRequest):
-    answer, context = rag_engine.query(req.query)
-    return RAGQueryResponse(answer=answer, retrieved_context=context)
+async def rag_query(req: RAGQueryRequest, request: Request):
+    """
+    One JSON answer, or - with "stream": true or Accept: text/event-stream -
+    server-sent events: `context` (the packed reports and the prompt's
+    token count), a `token` per piece of the answer as the LLM generates
+    it, then `done`, or `error` if the LLM fails part-way.
+    """
+    opts = {"k": req.k, "ef_search": req.ef_search, "nprobe": req.nprobe}
+    if not (req.stream or "text/event-stream" in request.headers.get("accept", "")):
+        answer, context = await rag_engine.answer(req.query, **opts)
+        return RAGQueryResponse(answer=answer, retrieved_context=context)
+
+    async def events():
+        try:
+            async for event, data in rag_engine.stream(req.query, **opts):
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 
+@app.get("/rag/index/stats")
+def rag_index_stats():
+    """
+    Size and dataset version of the loaded RAG index, plus the reused /
+    encoded / removed document counts of the last (re)build and the
+    background rebuild status.
+    """
+    return rag_engine.stats()
+
+
+@app.post("/rag/index/rebuild", status_code=202)
+def rag_index_rebuild(force: bool = False):
+    """
+    Starts a background rebuild if the index is behind the data (force:
+    even if it isn't) and returns the rebuild status; queries keep using
+    the current index until the new one is swapped in.
+    """
+    return rag_engine.request_rebuild("admin", force=force)
+
+
+@app.get("/debug/startup")
+def debug_startup():
+    """
+    Warm-up progress and step timings, and which heavy modules are loaded.
+    """
+    return startup_stats()
 
 
 @app.get("/debug/env")
@@ -0,0 +1,156 @@
+#%%
+import argparse
+import json
+import time
+from typing import Dict, Iterator, List, Optional
+
+import faiss
+import numpy as np
+
+from .ann_index import INDEX_TYPES, IndexBuilder, index_bytes, search
+from .config import RAG_TRAIN_SIZE
+
+# ======================================================
+# ANN INDEX BENCHMARK
+# ======================================================
+#
+# Recall@k against exact search, p50 / p99 single-query latency and index
+# memory for each RAG index type, on synthetic clustered embeddings:
+#
+#   python -m backend.bench_ann --sizes 10000,1000000,10000000 --dim 384
+#
+# Vectors are generated chunk by chunk and exact neighbours are computed
+# per chunk and merged, so ground truth never needs the whole set in memory
+# (the indexes being measured of course do: ~1.5 GB per million 384-d
+# vectors for flat / hnsw). Index-type parameters come from config.py
+# (RAG_HNSW_*, RAG_IVF_*, RAG_PQ_*); efSearch / nprobe are swept per query.
+
+CHUNK_ROWS = 250_000
+
+
+def _vectors(n: int, dim: int, seed: int, centers: np.ndarray) -> Iterator[np.ndarray]:
+    """
+    n unit vectors around the given cluster centers, in chunks.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, n - start)
+        x = centers[rng.integers(len(centers), size=rows)]
+        x = x + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+        x /= np.linalg.norm(x, axis=1, keepdims=True)
+        yield x.astype(np.float32)
+
+
+def _exact_neighbours(n: int, dim: int, seed: int, centers, queries, k: int) -> np.ndarray:
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.full((len(queries), k), -1, dtype=np.int64)
+    offset = 0
+    for chunk in _vectors(n, dim, seed, centers):
+        d, i = faiss.knn(queries, chunk, min(k, len(chunk)))
+        all_d = np.hstack([best_d, d])
+        all_i = np.hstack([best_i, i + offset])
+        top = np.argsort(all_d, axis=1)[:, :k]
+        best_d = np.take_along_axis(all_d, top, axis=1)
+        best_i = np.take_along_axis(all_i, top, axis=1)
+        offset += len(chunk)
+    return best_i
+
+
+def _measure(index, queries, truth, k, ef_search=None, nprobe=None) -> Dict:
+    latencies = []
+    found = np.empty_like(truth)
+    for q in range(len(queries)):
+        t0 = time.perf_counter()
+        _, ids = search(index, queries[q:q + 1], k, ef_search=ef_search, nprobe=nprobe)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found[q] = ids[0]
+    recall = np.mean([len(np.intersect1d(f, t)) / k for f, t in zip(found, truth)])
+    return {
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def run(
+    sizes: List[int],
+    dim: int = 384,
+    types: List[str] = list(INDEX_TYPES),
+    n_queries: int = 500,
+    k: int = 10,
+    ef_values: List[int] = (16, 64, 256),
+    nprobe_values: List[int] = (1, 8, 32),
+    seed: int = 0,
+    out: Optional[str] = None,
+) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((1024, dim)).astype(np.float32)
+    results = []
+
+    for n in sizes:
+        queries = next(_vectors(n_queries, dim, seed + 1, centers))
+        t0 = time.perf_counter()
+        truth = _exact_neighbours(n, dim, seed, centers, queries, k)
+        print(f"[bench] n={n:,}: exact ground truth in {time.perf_counter() - t0:.1f}s")
+
+        for kind in types:
+            t0 = time.perf_counter()
+            builder = IndexBuilder(kind, train_size=min(n, RAG_TRAIN_SIZE))
+            offset = 0
+            for chunk in _vectors(n, dim, seed, centers):
+                builder.add(np.arange(offset, offset + len(chunk)), chunk)
+                offset += len(chunk)
+            index = builder.finish()
+            if builder.kind != kind:
+                print(f"[bench] n={n:,}: too few training vectors for {kind}, built {builder.kind}")
+            build_s = time.perf_counter() - t0
+            memory_mb = index_bytes(index) / 2**20
+
+            if kind == "hnsw":
+                sweep = [{"ef_search": v} for v in ef_values]
+            elif kind in ("ivf_flat", "ivf_pq"):
+                sweep = [{"nprobe": v} for v in nprobe_values]
+            else:
+                sweep = [{}]
+
+            for params in sweep:
+                row = {
+                    "n": n, "type": kind, **params,
+                    "build_s": round(build_s, 2), "memory_mb": round(memory_mb, 1),
+                    **_measure(index, queries, truth, k, **params),
+                }
+                results.append(row)
+                print("[bench] " + "  ".join(f"{key}={val}" for key, val in row.items()))
+            del index, builder
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark RAG ANN index types.")
+    parser.add_argument("--sizes", default="10000,1000000,10000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", default="16,64,256")
+    parser.add_argument("--nprobe", default="1,8,32")
+    parser.add_argument("--threads", type=int, default=None, help="faiss OpenMP threads")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+    run(
+        sizes=[int(s) for s in args.sizes.split(",")],
+        dim=args.dim,
+        types=args.types.split(","),
+        n_queries=args.queries,
+        k=args.k,
+        ef_values=[int(v) for v in args.ef.split(",")],
+        nprobe_values=[int(v) for v in args.nprobe.split(",")],
+        out=args.out,
+    )
@@ -0,0 +1,162 @@
+#%%
+import argparse
+import json
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from .analytics import load_demand, load_inventory, load_shipments, load_suppliers
+from .ann_index import VECTOR_DTYPES, IndexBuilder, index_bytes, search
+from .config import EMBEDDING_MODEL, RAG_DOC_BATCH_SIZE
+from .embedding import BACKENDS, Embedder
+from .rag_docs import iter_docs
+
+# ======================================================
+# EMBEDDING PIPELINE BENCHMARK
+# ======================================================
+#
+# Encodes a sample of the RAG reports with the previous path (one
+# model.encode(texts) call, default settings, float32, single process)
+# and with each backend / batch size / worker count, and reports docs/sec
+# plus retrieval quality against the previous path: recall@k of the top-k
+# reports retrieved for sample queries, and mean cosine similarity of the
+# document vectors. Stored-vector dtypes are compared on index memory and
+# recall@k using the baseline vectors:
+#
+#   python -m backend.bench_embedding --docs 20000 --backends torch,onnx,onnx_int8
+#
+# Queries are the first lines (report title, id, name) of random reports.
+
+
+def _sample_docs(n: int, seed: int) -> List[str]:
+    texts = []
+    for batch, _ in iter_docs(
+        load_inventory(), load_demand(), load_suppliers(), load_shipments(),
+        batch_size=RAG_DOC_BATCH_SIZE,
+    ):
+        texts.extend(batch)
+    rng = np.random.default_rng(seed)
+    pick = rng.choice(len(texts), size=min(n, len(texts)), replace=False)
+    return [texts[i] for i in np.sort(pick)]
+
+
+def _neighbours(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    index = faiss.IndexFlatL2(doc_vectors.shape[1])
+    index.add(doc_vectors)
+    return index.search(query_vectors, k)[1]
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return round(float(np.mean([len(np.intersect1d(f, t)) / k for f, t in zip(found, truth)])), 4)
+
+
+def _mean_cosine(a: np.ndarray, b: np.ndarray) -> float:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return round(float(np.mean(np.sum(a * b, axis=1))), 4)
+
+
+def _encode_timed(encode, docs: List[str]):
+    t0 = time.perf_counter()
+    vectors = encode(docs)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - t0
+
+
+def run(
+    n_docs: int = 20000,
+    n_queries: int = 200,
+    k: int = 10,
+    backends: List[str] = ("torch",),
+    batch_sizes: List[int] = (32, 64, 128),
+    workers: List[int] = (1,),
+    seed: int = 0,
+    out: Optional[str] = None,
+) -> List[Dict]:
+    docs = _sample_docs(n_docs, seed)
+    rng = np.random.default_rng(seed + 1)
+    queries = [
+        "\n".join(docs[i].split("\n")[:3])
+        for i in rng.choice(len(docs), size=min(n_queries, len(docs)), replace=False)
+    ]
+    print(f"[bench] {len(docs):,} documents, {len(queries)} queries")
+
+    # previous path: one default encode call on the full list
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    base_docs, elapsed = _encode_timed(model.encode, docs)
+    base_queries = np.asarray(model.encode(queries), dtype=np.float32)
+    truth = _neighbours(base_docs, base_queries, k)
+    results = [{
+        "variant": "previous", "docs_per_sec": round(len(docs) / elapsed, 1),
+        f"recall@{k}": 1.0, "mean_cosine": 1.0,
+    }]
+    print("[bench] " + "  ".join(f"{key}={val}" for key, val in results[0].items()))
+    del model
+
+    for backend in backends:
+        for n_workers in workers:
+            for batch_size in batch_sizes:
+                embedder = Embedder(backend, batch_size=batch_size, workers=n_workers)
+                if embedder.backend != backend:
+                    break
+                with embedder.session():
+                    vectors, elapsed = _encode_timed(
+                        lambda texts: np.concatenate([
+                            embedder.encode(texts[i:i + RAG_DOC_BATCH_SIZE])
+                            for i in range(0, len(texts), RAG_DOC_BATCH_SIZE)
+                        ]),
+                        docs,
+                    )
+                query_vectors = embedder.encode(queries)
+                row = {
+                    "variant": f"{backend} batch={batch_size} workers={n_workers}",
+                    "docs_per_sec": round(len(docs) / elapsed, 1),
+                    f"recall@{k}": _recall(_neighbours(vectors, query_vectors, k), truth),
+                    "mean_cosine": _mean_cosine(vectors, base_docs),
+                }
+                results.append(row)
+                print("[bench] " + "  ".join(f"{key}={val}" for key, val in row.items()))
+
+    # stored precision, on the previous path's vectors
+    ids = np.arange(len(docs))
+    for dtype in VECTOR_DTYPES:
+        builder = IndexBuilder("flat", train_size=len(docs), dtype=dtype)
+        builder.add(ids, base_docs)
+        index = builder.finish()
+        row = {
+            "variant": f"storage {dtype}",
+            "index_mb": round(index_bytes(index) / 2**20, 2),
+            f"recall@{k}": _recall(search(index, base_queries, k)[1], truth),
+        }
+        results.append(row)
+        print("[bench] " + "  ".join(f"{key}={val}" for key, val in row.items()))
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the RAG embedding pipeline.")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default="torch", help=f"comma-separated: {BACKENDS}")
+    parser.add_argument("--batch-sizes", default="32,64,128")
+    parser.add_argument("--workers", default="1", help="comma-separated worker counts")
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    run(
+        n_docs=args.docs,
+        n_queries=args.queries,
+        k=args.k,
+        backends=args.backends.split(","),
+        batch_sizes=[int(b) for b in args.batch_sizes.split(",")],
+        workers=[int(w) for w in args.workers.split(",")],
+        out=args.out,
+    )
@@ -0,0 +1,248 @@
+#%%
+import math
+import multiprocessing as mp
+import queue
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import GENERATION_CHUNK_ROWS, GENERATION_WORKERS, STORAGE_FORMAT
+from .data_generator import (
+    CATEGORIES,
+    CHANNELS,
+    _end_date,
+    _vocabulary,
+    gen_demand_vec,
+    gen_inventory_vec,
+    gen_shipments_vec,
+    gen_suppliers_vec,
+    table_rng,
+)
+from .dataset_cache import dataset_cache
+from .storage import TABLES, CsvStore, NpyStore
+
+# ======================================================
+# STREAMING BULK GENERATION
+# ======================================================
+#
+# Each table is cut into fixed-size chunks; chunk i is always drawn from
+# table_rng(seed, table, i), so the output does not depend on how chunks are
+# scheduled. Chunks are grouped into contiguous parts, and parts of all four
+# tables run concurrently in a (spawned) process pool. A worker only ever
+# holds one chunk in memory:
+#   - CSV (always written; the frontend reads it): each part appends to its
+#     own part file; the parts are concatenated behind a header once every
+#     worker is done and the result replaces the table
+#   - npy (STORAGE_FORMAT="npy"): columns are preallocated with open_memmap
+#     as a new, not yet referenced segment and each worker writes its row
+#     range in place; rewriting _schema.json publishes them, so readers see
+#     the old table or the new one, never a mix
+
+
+def _table_sizes(n_rows: int, n_items: int, n_suppliers: int) -> Dict[str, int]:
+    return {
+        "inventory": n_items,
+        "demand_history": n_rows,
+        "suppliers": n_suppliers,
+        "shipments": n_rows,
+    }
+
+
+def _gen_chunk(table: str, spec: dict, chunk: int, start: int, n: int) -> pd.DataFrame:
+    seed = spec["seed"]
+    rng = table_rng(seed, table, chunk)
+
+    if table == "inventory":
+        return gen_inventory_vec(n, seed, rng=rng, start_id=start + 1)
+    if table == "demand_history":
+        return gen_demand_vec(n, spec["n_items"], seed, rng=rng, end_date=spec["end_date"])
+    if table == "suppliers":
+        return gen_suppliers_vec(n, seed, rng=rng, start_id=start + 1)
+    return gen_shipments_vec(
+        n, spec["n_items"], spec["n_suppliers"], seed,
+        rng=rng, start_id=start + 1, end_date=spec["end_date"]
+    )
+
+
+def _npy_dtypes(table: str, spec: dict) -> Dict[str, np.dtype]:
+    """
+    Column dtypes for a preallocated npy table. String columns take the
+    width of the vocabulary they are sampled from so every chunk fits.
+    """
+    probe = _gen_chunk(table, spec, 0, 0, 1)
+    widths = {
+        "name": _vocabulary(spec["seed"], "word").dtype,
+        "supplier_name": _vocabulary(spec["seed"], "company").dtype,
+        "category": CATEGORIES.dtype,
+        "channel": CHANNELS.dtype,
+    }
+    dates = TABLES[table]["dates"]
+    return {
+        col: widths.get(col, NpyStore._to_array(probe[col], col in dates).dtype)
+        for col in probe.columns
+    }
+
+
+def _write_part(task: dict, progress_q) -> int:
+    table, spec = task["table"], task["spec"]
+    chunk_rows, total = spec["chunk_rows"], task["total"]
+    dates = TABLES[table]["dates"]
+    written = 0
+
+    with open(task["part_path"], "w", newline="") as f:
+        for chunk in range(task["chunk_lo"], task["chunk_hi"]):
+            start = chunk * chunk_rows
+            n = min(chunk_rows, total - start)
+            df = _gen_chunk(table, spec, chunk, start, n)
+
+            df.to_csv(f, header=False, index=False)
+            for col, path in task["npy_paths"].items():
+                mm = np.load(path, mmap_mode="r+")
+                mm[start:start + n] = NpyStore._to_array(df[col], col in dates)
+                mm.flush()
+                del mm
+
+            written += n
+            progress_q.put((table, n))
+
+    return written
+
+
+def _plan(
+    table: str, total: int, spec: dict, workers: int, csv: CsvStore, npy_paths: Dict[str, str]
+) -> List[dict]:
+    n_chunks = math.ceil(total / spec["chunk_rows"])
+    n_parts = max(1, min(n_chunks, workers))
+    bounds = np.linspace(0, n_chunks, n_parts + 1).astype(int)
+
+    tasks = []
+    for part, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if hi <= lo:
+            continue
+        tasks.append({
+            "table": table, "spec": spec, "total": total,
+            "chunk_lo": int(lo), "chunk_hi": int(hi),
+            "part_path": str(csv.identity_path(table)) + f".part-{part:04d}",
+            "npy_paths": npy_paths,
+        })
+    return tasks
+
+
+def _report(progress: Dict[str, int], totals: Dict[str, int], t0: float):
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    done = sum(progress.values())
+    per_table = ", ".join(f"{t} {progress[t]:,}/{totals[t]:,}" for t in totals)
+    print(f"[generate] {done:,} rows, {done / elapsed:,.0f} rows/sec ({per_table})")
+
+
+def stream_synthetic_data(
+    n_rows: int = 5000,
+    n_items: int = 5000,
+    n_suppliers: int = 5000,
+    seed: Optional[int] = None,
+    end_date=None,
+    chunk_rows: int = GENERATION_CHUNK_ROWS,
+    workers: int = GENERATION_WORKERS,
+    fmt: str = STORAGE_FORMAT,
+    report_every: float = 5.0,
+    on_progress: Optional[Callable[[Dict[str, int], float], None]] = None,
+) -> Dict[str, str]:
+    """
+    Generates the four tables chunk by chunk across a process pool and writes
+    them incrementally as CSV, plus npy columns when `fmt` is "npy". Peak
+    memory is roughly `workers * chunk_rows` rows. Progress (rows/sec) is
+    printed every `report_every` seconds and passed to
+    `on_progress(rows_by_table, rps)`. Returns the CSV paths.
+    """
+    seed = 0 if seed is None else seed
+    spec = {
+        "seed": seed,
+        "n_items": n_items,
+        "n_suppliers": n_suppliers,
+        "end_date": _end_date(end_date),
+        "chunk_rows": max(1, chunk_rows),
+    }
+    totals = _table_sizes(n_rows, n_items, n_suppliers)
+    csv = CsvStore()
+    npy = NpyStore() if fmt == "npy" else None
+
+    # npy: preallocate every column as an unreferenced segment before the
+    # workers start writing
+    npy_tables = {}
+    for table, total in totals.items():
+        if npy is None:
+            npy_tables[table] = (None, [], [], {})
+            continue
+        seg_id, obsolete = npy.replacement_segment(table)
+        dtypes = _npy_dtypes(table, spec)
+        paths = {}
+        for col, dtype in dtypes.items():
+            path = npy.segment_path(table, col, seg_id)
+            np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(total,)).flush()
+            paths[col] = str(path)
+        columns = [{"name": c, "dtype": d.str} for c, d in dtypes.items()]
+        npy_tables[table] = (seg_id, obsolete, columns, paths)
+
+    tasks = []
+    for table, total in totals.items():
+        tasks += _plan(table, total, spec, workers, csv, npy_tables[table][3])
+
+    progress = {t: 0 for t in totals}
+    t0 = last = time.perf_counter()
+
+    # spawn, like the analytics pool: forking a threaded server process is unsafe
+    ctx = mp.get_context("spawn")
+    with ctx.Manager() as manager, ProcessPoolExecutor(
+        max_workers=max(1, workers), mp_context=ctx
+    ) as pool:
+        progress_q = manager.Queue()
+        pending = {pool.submit(_write_part, task, progress_q) for task in tasks}
+
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()  # surface worker errors
+            try:
+                while True:
+                    table, n = progress_q.get_nowait()
+                    progress[table] += n
+            except queue.Empty:
+                pass
+
+            now = time.perf_counter()
+            if now - last >= report_every:
+                last = now
+                _report(progress, totals, t0)
+                if on_progress is not None:
+                    on_progress(dict(progress), sum(progress.values()) / (now - t0))
+
+    _report(progress, totals, t0)
+
+    paths = {}
+    for table in totals:
+        final = csv.identity_path(table)
+        tmp = final.with_suffix(".csv.tmp")
+        header = _gen_chunk(table, spec, 0, 0, 1).head(0).to_csv(index=False)
+        with open(tmp, "w", newline="") as out:
+            out.write(header)
+            for task in (t for t in tasks if t["table"] == table):
+                with open(task["part_path"]) as part:
+                    shutil.copyfileobj(part, out, length=16 * 1024 * 1024)
+        for task in (t for t in tasks if t["table"] == table):
+            Path(task["part_path"]).unlink()
+        tmp.replace(final)
+        dataset_cache.invalidate(final)
+        paths[table] = str(final)
+
+        if npy is not None:
+            seg_id, obsolete, columns, _ = npy_tables[table]
+            dataset_cache.invalidate(npy.write_schema(
+                table, columns, totals[table], [{"id": seg_id, "rows": totals[table]}], obsolete
+            ))
+
+    return paths
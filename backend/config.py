@@ -13,16 +13,131 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 SYNTHETIC_DIR = DATA_DIR / "synthetic"
 PROCESSED_DIR = DATA_DIR / "processed"
+COLUMNAR_DIR = SYNTHETIC_DIR / "columnar"
 
 # Ensure folders exist
 SYNTHETIC_DIR.mkdir(parents=True, exist_ok=True)
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
+# Table storage backend used by the analytics loaders: "csv" or "npy"
+# (memory-mapped columnar files under COLUMNAR_DIR)
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv")
+
+# Streaming generation of large datasets: rows per chunk and worker processes
+GENERATION_CHUNK_ROWS = int(os.getenv("GENERATION_CHUNK_ROWS", "1000000"))
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", str(os.cpu_count() or 1)))
+
+# Batch forecasting: items per task (tasks run on the analytics worker pool)
+FORECAST_BATCH_SIZE = int(os.getenv("FORECAST_BATCH_SIZE", "50"))
+
+# API: worker processes for CPU-bound analytics requests (0 runs them in threads)
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Fitted ARIMA store: persisted records, in-memory results, and how many
+# appended days are absorbed with stored params before a warm-started refit
+FORECAST_MODEL_DIR = PROCESSED_DIR / "forecast_models"
+FORECAST_STORE_MAX_ENTRIES = int(os.getenv("FORECAST_STORE_MAX_ENTRIES", "20000"))
+FORECAST_STORE_MEMORY_ENTRIES = int(os.getenv("FORECAST_STORE_MEMORY_ENTRIES", "512"))
+FORECAST_REFIT_AFTER_DAYS = int(os.getenv("FORECAST_REFIT_AFTER_DAYS", "7"))
+
+# Running per-item demand aggregates maintained by ingestion
+DEMAND_AGGREGATES_PATH = PROCESSED_DIR / "demand_aggregates.npz"
+
+# Anomaly model: persisted IsolationForest and the max rows it is fitted on
+ANOMALY_MODEL_PATH = PROCESSED_DIR / "anomaly_model.joblib"
+ANOMALY_SAMPLE_ROWS = int(os.getenv("ANOMALY_SAMPLE_ROWS", "200000"))
+
+# Table summaries: rows per chunk when building the streaming sketches
+SUMMARY_CHUNK_ROWS = int(os.getenv("SUMMARY_CHUNK_ROWS", "250000"))
+
+# Responses at least this large are gzip-compressed for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+# API startup: load the RAG index, embedding model and model-fitting
+# libraries on a background thread instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1").lower() not in ("0", "false", "no")
+
 # RAG / LLM config
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Persisted RAG index (FAISS index, chunks, metainfo, manifest)
+RAG_INDEX_DIR = PROCESSED_DIR / "rag_index"
+
+# Embedding pipeline: "torch", "onnx" or "onnx_int8" (quantized, CPU;
+# needs sentence-transformers[onnx]). With RAG_EMBED_WORKERS > 1, encodes of
+# at least RAG_EMBED_MP_MIN_TEXTS texts during index builds run in a pool of
+# processes.
+RAG_EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch")
+RAG_EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+RAG_EMBED_WORKERS = int(os.getenv("RAG_EMBED_WORKERS", "1"))
+RAG_EMBED_MP_MIN_TEXTS = int(os.getenv("RAG_EMBED_MP_MIN_TEXTS", "2048"))
+RAG_ONNX_FILE = os.getenv("RAG_ONNX_FILE", "onnx/model.onnx")
+RAG_ONNX_INT8_FILE = os.getenv("RAG_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Reports rendered and embedded per batch while (re)building the RAG index
+RAG_DOC_BATCH_SIZE = int(os.getenv("RAG_DOC_BATCH_SIZE", "4096"))
+
+# RAG vector index: "flat" (exact scan), "hnsw", "ivf_flat" or "ivf_pq".
+# IVF / PQ are trained at build time on up to RAG_TRAIN_SIZE vectors;
+# efSearch / nprobe below are per-query defaults.
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+# Stored vector precision for flat / hnsw / ivf_flat: "float32", "float16"
+# (half the memory) or "int8" (a quarter; trained per dimension).
+# ivf_pq always stores PQ codes.
+RAG_VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "200"))
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))     # 0: 4 * sqrt(training vectors)
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "0"))               # sub-quantizers; 0: dim / 8
+RAG_PQ_NBITS = int(os.getenv("RAG_PQ_NBITS", "8"))
+RAG_TRAIN_SIZE = int(os.getenv("RAG_TRAIN_SIZE", "100000"))
+
+# /rag/query caches: LRU of question embeddings, and a semantic answer
+# cache hit when a question's cosine similarity to a cached one is at least
+# RAG_ANSWER_CACHE_THRESHOLD (same dataset version, within the TTL)
+RAG_EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "1024"))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "512"))
+RAG_ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))   # seconds
+RAG_ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Hybrid retrieval: explicit item / supplier ids resolve by lookup, type and
+# category mentions filter the search, and dense + BM25 rankings (top
+# RAG_FUSION_CANDIDATES each) are merged by reciprocal rank fusion
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "1").lower() not in ("0", "false", "no")
+RAG_FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", "50"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Prompt context: RAG_TOP_K reports are retrieved per question and packed
+# into one compact table per report type ("table") or concatenated verbatim
+# ("raw"), in rank order, up to RAG_CONTEXT_TOKEN_BUDGET tokens (counted
+# with tiktoken when installed, else estimated). Each query's prompt-token
+# count is printed (RAG_LOG_PROMPT_TOKENS=0 turns that off) and summed in
+# the "rag" -> "context" counters of /cache/stats
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_CONTEXT_FORMAT = os.getenv("RAG_CONTEXT_FORMAT", "table")
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+RAG_LOG_PROMPT_TOKENS = os.getenv("RAG_LOG_PROMPT_TOKENS", "1").lower() not in ("0", "false", "no")
+
+# Rebuild the RAG index in the background when /data/generate rewrites the
+# tables (queries notice other data changes and trigger it themselves)
+RAG_REBUILD_ON_DATA_CHANGE = os.getenv("RAG_REBUILD_ON_DATA_CHANGE", "1").lower() not in ("0", "false", "no")
+
 # GPT-5 model
 LLM_MODEL = "gpt-4o-mini"
 
+# LLM backend for RAG answers: "openai", "stub" (local, for offline load
+# tests) or "none" (context only); empty = openai if OPENAI_API_KEY is set.
+# OpenAI requests share one connection pool, time out after LLM_TIMEOUT_S
+# and are retried with exponential backoff until the first token arrives.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_STUB_FIRST_TOKEN_MS = float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "200"))
+LLM_STUB_TOKEN_MS = float(os.getenv("LLM_STUB_TOKEN_MS", "20"))
+
 # %%
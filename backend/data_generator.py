@@ -3,8 +3,12 @@ import pandas as pd
 import numpy as np
 from faker import Faker
 import random
+from functools import lru_cache
 from pathlib import Path
-from .config import SYNTHETIC_DIR
+from typing import Optional
+from .config import STORAGE_FORMAT
+from .dataset_cache import dataset_cache
+from .storage import CsvStore, get_store, table_lock
 
 fake = Faker()
 
@@ -99,32 +103,203 @@ def gen_shipments(n=5000, n_items=5000, n_suppliers=5000):
     return pd.DataFrame(shipments)
 
 
+# ============================================
+# VECTORIZED BULK GENERATION
+# ============================================
+#
+# Column-at-a-time draws from a seeded np.random.Generator. Names and company
+# names are sampled by index from vocabularies pre-generated by a seeded
+# Faker, so the same (seed, sizes, end_date) always yields identical tables.
+
+CATEGORIES = np.array(["Grocery", "Electronics", "Home", "Apparel"])
+CHANNELS = np.array(["Online", "Store"])
+VOCAB_SIZE = 2000
+
+# stable per-table stream ids for the seeded generators
+TABLE_STREAMS = {"inventory": 0, "demand_history": 1, "suppliers": 2, "shipments": 3}
+
+
+def table_rng(seed: int, table: str, chunk: int = 0) -> np.random.Generator:
+    return np.random.default_rng([seed, TABLE_STREAMS[table], chunk])
+
+
+@lru_cache(maxsize=8)
+def _vocabulary(seed: int, kind: str) -> np.ndarray:
+    f = Faker()
+    f.seed_instance(seed)
+    draw = f.word if kind == "word" else f.company
+    return np.array([draw() for _ in range(VOCAB_SIZE)])
+
+
+def _end_date(end_date=None) -> pd.Timestamp:
+    return pd.Timestamp(end_date).normalize() if end_date is not None else pd.Timestamp.today().normalize()
+
+
+def gen_inventory_vec(n: int, seed: int, rng=None, start_id: int = 1) -> pd.DataFrame:
+    rng = rng if rng is not None else table_rng(seed, "inventory")
+    base_cost = rng.uniform(2, 300, n)
+
+    return pd.DataFrame({
+        "item_id": np.arange(start_id, start_id + n),
+        "name": _vocabulary(seed, "word")[rng.integers(0, VOCAB_SIZE, n)],
+        "category": CATEGORIES[rng.integers(0, len(CATEGORIES), n)],
+        "stock": rng.integers(0, 2001, n),
+        "reorder_point": rng.integers(20, 201, n),
+        "unit_cost": base_cost.round(2),
+        "selling_price": (base_cost * rng.uniform(1.15, 2.5, n)).round(2),
+    })
+
+
+def gen_demand_vec(n_rows: int, n_items: int, seed: int, rng=None, end_date=None) -> pd.DataFrame:
+    rng = rng if rng is not None else table_rng(seed, "demand_history")
+    dates = pd.date_range(end=_end_date(end_date), periods=60).to_numpy()
+    promo = (rng.random(n_rows) < 0.25).astype(np.int64)  # 25% promo chance
+
+    return pd.DataFrame({
+        "date": dates[rng.integers(0, len(dates), n_rows)],
+        "item_id": rng.integers(1, n_items + 1, n_rows),
+        "units_sold": rng.poisson(5, n_rows) * (1 + promo),
+        "channel": CHANNELS[rng.integers(0, len(CHANNELS), n_rows)],
+        "promo_flag": promo,
+        "shrinkage": rng.binomial(1, 0.03, n_rows),
+    })
+
+
+def gen_suppliers_vec(n: int, seed: int, rng=None, start_id: int = 1) -> pd.DataFrame:
+    rng = rng if rng is not None else table_rng(seed, "suppliers")
+
+    return pd.DataFrame({
+        "supplier_id": np.arange(start_id, start_id + n),
+        "supplier_name": _vocabulary(seed, "company")[rng.integers(0, VOCAB_SIZE, n)],
+        "on_time_rate": rng.uniform(0.5, 0.99, n).round(2),
+        "defect_rate": rng.uniform(0.01, 0.15, n).round(2),
+        "lead_time_days": rng.integers(1, 46, n),
+    })
+
+
+def gen_shipments_vec(
+    n: int, n_items: int, n_suppliers: int, seed: int,
+    rng=None, start_id: int = 1, end_date=None
+) -> pd.DataFrame:
+    rng = rng if rng is not None else table_rng(seed, "shipments")
+    end = _end_date(end_date).to_datetime64().astype("datetime64[D]")
+
+    # shipped 5..120 days ago, received uniformly between shipped and end
+    shipped = end - rng.integers(5, 121, n).astype("timedelta64[D]")
+    transit = (rng.random(n) * ((end - shipped).astype(np.int64) + 1)).astype(np.int64)
+    received = shipped + transit.astype("timedelta64[D]")
+
+    return pd.DataFrame({
+        "shipment_id": np.arange(start_id, start_id + n),
+        "item_id": rng.integers(1, n_items + 1, n),
+        "qty": rng.integers(10, 501, n),
+        "date_shipped": shipped,
+        "date_received": received,
+        "supplier_id": rng.integers(1, n_suppliers + 1, n),
+    })
+
+
 # ============================================
 # MASTER SAVE FUNCTION
 # ============================================
-def save_synthetic_data():
-    print("Generating large synthetic retail dataset...")
+GENERATION_MODES = ("rows", "vectorized", "streaming")
+
 
-    inventory = gen_inventory()
-    demand = gen_demand()
-    suppliers = gen_suppliers()
-    shipments = gen_shipments()
+def save_synthetic_data(
+    mode: str = "rows",
+    n_rows: int = 5000,
+    n_items: int = 5000,
+    n_suppliers: int = 5000,
+    seed: Optional[int] = None,
+    end_date=None,
+    **stream_kwargs,
+):
+    """
+    mode="rows" is the original per-row Faker generator; mode="vectorized"
+    draws whole columns from a seeded generator and is reproducible for a
+    given seed and end_date. n_rows sizes demand history and shipments.
 
-    inv_path = SYNTHETIC_DIR / "inventory.csv"
-    demand_path = SYNTHETIC_DIR / "demand_history.csv"
-    supplier_path = SYNTHETIC_DIR / "supplier.csv"
-    shipment_path = SYNTHETIC_DIR / "shipments.csv"
+    mode="streaming" hands off to bulk_generator.stream_synthetic_data, which
+    writes CSV (and the STORAGE_FORMAT copy) chunk by chunk;
+    `stream_kwargs` (chunk_rows, workers, ...) are passed through.
+    """
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{mode}', expected one of {GENERATION_MODES}")
 
-    inventory.to_csv(inv_path, index=False)
-    demand.to_csv(demand_path, index=False)
-    suppliers.to_csv(supplier_path, index=False)
-    shipments.to_csv(shipment_path, index=False)
+    if mode == "streaming":
+        from .bulk_generator import stream_synthetic_data
+
+        return stream_synthetic_data(
+            n_rows=n_rows, n_items=n_items, n_suppliers=n_suppliers,
+            seed=seed, end_date=end_date, **stream_kwargs
+        )
+
+    print("Generating large synthetic retail dataset...")
+
+    if mode == "vectorized":
+        seed = 0 if seed is None else seed
+        inventory = gen_inventory_vec(n_items, seed)
+        demand = gen_demand_vec(n_rows, n_items, seed, end_date=end_date)
+        suppliers = gen_suppliers_vec(n_suppliers, seed)
+        shipments = gen_shipments_vec(n_rows, n_items, n_suppliers, seed, end_date=end_date)
+    else:
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+            fake.seed_instance(seed)
+        inventory = gen_inventory(n_items)
+        demand = gen_demand(n_rows, n_items)
+        suppliers = gen_suppliers(n_suppliers)
+        shipments = gen_shipments(n_rows, n_items, n_suppliers)
+
+    tables = {
+        "inventory": inventory,
+        "demand_history": demand,
+        "suppliers": suppliers,
+        "shipments": shipments,
+    }
+    paths = write_tables(tables)
 
     return {
-        "inventory": str(inv_path),
-        "demand_history": str(demand_path),
-        "suppliers": str(supplier_path),
-        "shipments": str(shipment_path)
+        "inventory": paths["inventory"],
+        "demand_history": paths["demand_history"],
+        "suppliers": paths["suppliers"],
+        "shipments": paths["shipments"]
     }
 
-# %%
+
+def write_tables(tables: dict) -> dict:
+    """
+    Writes each table as CSV (what the frontend reads) and, when
+    STORAGE_FORMAT selects a columnar backend, in that format as well.
+    Returns the CSV paths.
+    """
+    csv_store = CsvStore()
+    extra = get_store() if STORAGE_FORMAT != csv_store.name else None
+
+    paths = {}
+    for name, df in tables.items():
+        path = csv_store.write(name, df)
+        paths[name] = str(path)
+        # mtime/size already change on rewrite; drop entries eagerly anyway so
+        # a same-size rewrite within the filesystem's mtime granularity is seen
+        dataset_cache.invalidate(path)
+        if extra is not None:
+            dataset_cache.invalidate(extra.write(name, df))
+
+    return paths
+
+
+def append_table(name: str, df: pd.DataFrame) -> str:
+    """
+    Appends rows to one table, in CSV and (if enabled) the columnar copy,
+    mirroring write_tables. The table lock is held across both so the two
+    copies see appends in the same order. Returns the CSV path.
+    """
+    csv_store = CsvStore()
+    with table_lock(name):
+        path = csv_store.append(name, df)
+        dataset_cache.invalidate(path)
+        if STORAGE_FORMAT != csv_store.name:
+            dataset_cache.invalidate(get_store().append(name, df))
+    return str(path)
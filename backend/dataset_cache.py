@@ -0,0 +1,98 @@
+#%%
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# ======================================================
+# DATASET CACHE
+# ======================================================
+#
+# Parsed DataFrames are held in memory and keyed on file identity
+# (path + mtime + size). Whenever a file on disk is rewritten its identity
+# changes, so the next load transparently re-parses it. Cached frames are
+# shared between requests: callers must treat them as read-only.
+
+
+FileIdentity = Tuple[str, int, int]
+
+
+def file_identity(path: Path) -> FileIdentity:
+    """
+    (path, mtime_ns, size) for a file. Raises FileNotFoundError if missing.
+    """
+    st = Path(path).stat()
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+class DatasetCache:
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Any], Tuple[FileIdentity, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def get(self, path: Path, loader: Callable[[], Any], variant: Any = None) -> Any:
+        """
+        Return the cached value for `path`, calling `loader()` when the file
+        is new to the cache (miss) or has changed on disk (reload).
+        `variant` distinguishes different views of the same file.
+        """
+        ident = file_identity(path)
+        key = (str(path), variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == ident:
+                self.hits += 1
+                return entry[1]
+
+        value = loader()
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._entries[key] = (ident, value)
+
+        return value
+
+    def invalidate(self, path: Optional[Path] = None):
+        """
+        Drop cached entries for one path, or everything if no path is given.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == str(path)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+            }
+
+
+def dataset_version(paths: Iterable[Path]) -> str:
+    """
+    Short fingerprint over the identity of a set of files.
+    Missing files contribute a fixed marker so the version is always defined.
+    """
+    h = hashlib.sha1()
+    for p in paths:
+        try:
+            h.update(repr(file_identity(p)).encode())
+        except FileNotFoundError:
+            h.update(f"{p}:missing".encode())
+    return h.hexdigest()[:16]
+
+
+# Singleton instance
+dataset_cache = DatasetCache()
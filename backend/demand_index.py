@@ -0,0 +1,110 @@
+#%%
+from dataclasses import dataclass
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# ITEM x DAY DEMAND INDEX
+# ======================================================
+#
+# Dense item x day arrays built once per demand file version. Row i is
+# item_ids[i] (sorted), column t is dates[t] (consecutive days from the
+# first to the last date in the data). Analytics slice and reduce these
+# arrays instead of grouping the long demand table per request.
+
+
+@dataclass(frozen=True)
+class DemandIndex:
+    item_ids: np.ndarray        # sorted, one per row
+    dates: pd.DatetimeIndex     # one per column
+    units: np.ndarray           # sum of units_sold
+    promo_units: np.ndarray     # sum of units_sold on promo rows
+    rows: np.ndarray            # number of demand rows
+    promo_rows: np.ndarray      # number of promo rows
+    shrinkage: np.ndarray       # sum of shrinkage events
+
+    @property
+    def matrix(self) -> Tuple[np.ndarray, pd.DatetimeIndex, np.ndarray]:
+        """
+        (item_ids, dates, float units matrix), the input of fast_forecast.
+        """
+        return self.item_ids, self.dates, self.units.astype(np.float64)
+
+    def item_totals(self) -> pd.DataFrame:
+        """
+        One row per item: units, rows, promo_units, promo_rows, shrinkage
+        and active_days (days with at least one demand row).
+        """
+        return pd.DataFrame({
+            "item_id": self.item_ids,
+            "units": self.units.sum(axis=1),
+            "rows": self.rows.sum(axis=1),
+            "promo_units": self.promo_units.sum(axis=1),
+            "promo_rows": self.promo_rows.sum(axis=1),
+            "shrinkage": self.shrinkage.sum(axis=1),
+            "active_days": (self.rows > 0).sum(axis=1),
+        })
+
+    def positions(self, item_ids: Sequence[int]) -> np.ndarray:
+        """
+        Row position of each item_id, -1 for ids not in the index.
+        """
+        ids = np.asarray(item_ids, dtype=self.item_ids.dtype)
+        pos = np.searchsorted(self.item_ids, ids)
+        pos = np.minimum(pos, max(len(self.item_ids) - 1, 0))
+        found = (len(self.item_ids) > 0) & (self.item_ids[pos] == ids)
+        return np.where(found, pos, -1)
+
+    def daily_series(self, pos: int) -> pd.Series:
+        """
+        units_sold per day for the item at row `pos`, from its first to its
+        last day with demand rows, zero-filled in between.
+        """
+        active = np.flatnonzero(self.rows[pos])
+        if len(active) == 0:
+            return pd.Series([], index=pd.DatetimeIndex([], freq="D"), dtype=np.float64)
+        lo, hi = active[0], active[-1] + 1
+        return pd.Series(
+            self.units[pos, lo:hi].astype(np.float64),
+            index=pd.DatetimeIndex(self.dates[lo:hi], freq="D"),
+        )
+
+
+def build_demand_index(demand: pd.DataFrame) -> DemandIndex:
+    """
+    Builds the index from a demand table with item_id, date, units_sold,
+    promo_flag and shrinkage. Timestamps are bucketed into calendar days.
+    """
+    if demand.empty:
+        empty = np.zeros((0, 0), dtype=np.int64)
+        return DemandIndex(
+            np.array([], dtype=np.int64), pd.DatetimeIndex([]), empty, empty, empty, empty, empty
+        )
+
+    days = demand["date"].dt.normalize()
+    start, end = days.min(), days.max()
+    dates = pd.date_range(start, end, freq="D")
+    day = ((days - start) // pd.Timedelta(days=1)).to_numpy()
+
+    item_ids, row = np.unique(demand["item_id"].to_numpy(), return_inverse=True)
+    flat = row * len(dates) + day
+    size = len(item_ids) * len(dates)
+
+    def scatter(weights=None) -> np.ndarray:
+        out = np.bincount(flat, weights=weights, minlength=size)
+        return out.astype(np.int64).reshape(len(item_ids), len(dates))
+
+    units = demand["units_sold"].to_numpy()
+    promo = demand["promo_flag"].to_numpy() == 1
+
+    return DemandIndex(
+        item_ids=item_ids,
+        dates=dates,
+        units=scatter(units),
+        promo_units=scatter(np.where(promo, units, 0)),
+        rows=scatter(),
+        promo_rows=scatter(promo.astype(np.int64)),
+        shrinkage=scatter(demand["shrinkage"].to_numpy()),
+    )
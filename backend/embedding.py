@@ -0,0 +1,124 @@
+#%%
+import importlib.util
+import threading
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+from .config import (
+    EMBEDDING_MODEL,
+    RAG_EMBED_BACKEND,
+    RAG_EMBED_BATCH_SIZE,
+    RAG_EMBED_WORKERS,
+    RAG_EMBED_MP_MIN_TEXTS,
+    RAG_ONNX_FILE,
+    RAG_ONNX_INT8_FILE,
+)
+from .lazy import lazy_import
+
+sentence_transformers = lazy_import("sentence_transformers")
+
+# ======================================================
+# EMBEDDING PIPELINE
+# ======================================================
+#
+# Wraps the sentence transformer used for both reports and questions:
+#   backend   "torch" (default), "onnx" or "onnx_int8" (dynamically
+#             quantized ONNX weights, CPU); ONNX needs
+#             sentence-transformers[onnx] and falls back to torch without it
+#   loading   the model (and torch) is loaded on first encode, or by the
+#             API's startup warm-up, not when the Embedder is created
+#   batching  explicit batch_size for every encode
+#   workers   > 1 encodes large inputs in a pool of processes, one model
+#             copy each; the pool lives for one session() (an index build)
+#
+# Vectors from different backends aren't interchangeable, so `name` (the
+# tag stored with the persisted index) includes the backend.
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+
+def _onnx_available() -> bool:
+    return all(importlib.util.find_spec(m) is not None for m in ("optimum", "onnxruntime"))
+
+
+def load_model(backend: str = RAG_EMBED_BACKEND) -> "sentence_transformers.SentenceTransformer":
+    if backend == "torch":
+        return sentence_transformers.SentenceTransformer(EMBEDDING_MODEL)
+    if backend in ("onnx", "onnx_int8"):
+        file_name = RAG_ONNX_INT8_FILE if backend == "onnx_int8" else RAG_ONNX_FILE
+        return sentence_transformers.SentenceTransformer(
+            EMBEDDING_MODEL, backend="onnx", model_kwargs={"file_name": file_name}
+        )
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+
+class Embedder:
+    def __init__(
+        self,
+        backend: str = RAG_EMBED_BACKEND,
+        batch_size: int = RAG_EMBED_BATCH_SIZE,
+        workers: int = RAG_EMBED_WORKERS,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+        if backend != "torch" and not _onnx_available():
+            print(f"[embedding] {backend} backend needs sentence-transformers[onnx]; using torch")
+            backend = "torch"
+        self.backend = backend
+        self.batch_size = batch_size
+        self.workers = workers
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._pool = None
+        self._in_session = False
+
+    @property
+    def model(self) -> "sentence_transformers.SentenceTransformer":
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = load_model(self.backend)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def name(self) -> str:
+        return EMBEDDING_MODEL if self.backend == "torch" else f"{EMBEDDING_MODEL}:{self.backend}"
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @contextmanager
+    def session(self):
+        """
+        Scope for a run of large encodes: the worker pool, if one is
+        needed, is started on first use and stopped on exit.
+        """
+        self._in_session = True
+        try:
+            yield self
+        finally:
+            self._in_session = False
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        (len(texts), dim) float32 embeddings.
+        """
+        if self._in_session and self.workers > 1 and len(texts) >= RAG_EMBED_MP_MIN_TEXTS:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(["cpu"] * self.workers)
+            vectors = self.model.encode_multi_process(
+                texts, self._pool, batch_size=self.batch_size
+            )
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
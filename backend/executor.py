@@ -0,0 +1,163 @@
+#%%
+import asyncio
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .analytics import current_dataset_version
+from .config import ANALYTICS_WORKERS
+from .dataset_cache import dataset_cache
+from .model_store import model_store
+
+# ======================================================
+# ANALYTICS EXECUTOR
+# ======================================================
+#
+# Async handlers hand CPU-bound analytics to a process pool (or to threads
+# for work that needs this process's state), so the event loop and /health
+# stay responsive under load.
+#
+# Identical concurrent requests (same endpoint + arguments + dataset
+# version) are coalesced: the first one computes, the rest await the same
+# future. Coalescing only covers requests in flight; nothing is cached
+# after the computation finishes.
+#
+# Each worker process has its own dataset cache and model store. Every job
+# returns the worker's counters along with its result, and worker_stats()
+# sums the latest counters of each worker.
+
+# counters that describe shared state (the model store's files), not a worker's
+_SHARED_COUNTERS = ("on_disk",)
+
+
+def _call_with_stats(fn: Callable, *args) -> Tuple[Any, int, Dict[str, Dict]]:
+    """
+    fn(*args) in a worker: (result, worker pid, the worker's cache counters).
+    """
+    result = fn(*args)
+    return result, os.getpid(), {
+        "dataset_cache": dataset_cache.stats(),
+        "model_store": model_store.stats(),
+    }
+
+
+class AnalyticsExecutor:
+    def __init__(self, workers: int = ANALYTICS_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.computed = 0
+        self.coalesced = 0
+        self._worker_stats: Dict[int, Dict[str, Dict]] = {}  # pid -> latest counters
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that runs uvicorn / FAISS threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=mp.get_context("spawn")
+                )
+            return self._pool
+
+    async def run(
+        self, endpoint: str, fn: Callable, *args, process: bool = True
+    ) -> Any:
+        """
+        fn(*args) in a worker process (process=False: in a thread),
+        shared with any identical request already in flight.
+        Exceptions raised by fn propagate to every waiter.
+        """
+        key = (endpoint, repr(args), current_dataset_version())
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            pool = self._get_pool() if process else None
+            if pool is None:
+                future = asyncio.get_running_loop().run_in_executor(None, fn, *args)
+            else:
+                future = asyncio.ensure_future(self._in_worker(pool, fn, args))
+            self._inflight[key] = future
+            self.computed += 1
+
+            def done(_, key=key, future=future):
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+            future.add_done_callback(done)
+
+        # shield: a disconnecting client doesn't cancel work others are awaiting
+        return await asyncio.shield(future)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        fn(*args) on the worker pool as a concurrent Future of its result,
+        for synchronous fan-out (e.g. forecast_items); not coalesced.
+        Needs workers > 0.
+        """
+        pool = self._get_pool()
+        if pool is None:
+            raise RuntimeError("analytics executor has no worker pool (workers <= 0)")
+        outer: Future = Future()
+        inner = pool.submit(_call_with_stats, fn, *args)
+        outer.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+
+        def done(f: Future):
+            if outer.done():  # cancelled by the caller
+                return
+            if f.cancelled():
+                outer.cancel()
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                result, pid, counters = f.result()
+                self._worker_stats[pid] = counters
+                outer.set_result(result)
+
+        inner.add_done_callback(done)
+        return outer
+
+    async def _in_worker(self, pool: ProcessPoolExecutor, fn: Callable, args: Tuple) -> Any:
+        loop = asyncio.get_running_loop()
+        result, pid, counters = await loop.run_in_executor(pool, _call_with_stats, fn, *args)
+        self._worker_stats[pid] = counters
+        return result
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self._worker_stats.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "in_flight": len(self._inflight),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+        }
+
+    def worker_stats(self) -> Dict[str, Any]:
+        """
+        Dataset cache and model store counters summed over the worker
+        processes, as of each worker's last completed job.
+        """
+        reports = list(self._worker_stats.values())
+        out: Dict[str, Any] = {"workers_reporting": len(reports)}
+        for name in ("dataset_cache", "model_store"):
+            totals: Dict[str, int] = {}
+            for report in reports:
+                for k, v in report[name].items():
+                    totals[k] = max(totals.get(k, 0), v) if k in _SHARED_COUNTERS else totals.get(k, 0) + v
+            out[name] = totals
+        return out
+
+
+# Singleton instance
+analytics_executor = AnalyticsExecutor()
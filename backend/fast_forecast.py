@@ -0,0 +1,186 @@
+#%%
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# VECTORIZED CATALOG FORECASTING
+# ======================================================
+#
+# Every method works on the full item x day matrix Y (rows = items, columns
+# = consecutive days, zeros where nothing sold; see DemandIndex.matrix) and
+# returns an items x periods matrix of forecasts. Recursions loop over days only; each
+# step is a vector operation across all items.
+
+FAST_METHODS = ("ses", "holt", "croston", "sba", "seasonal_naive", "auto")
+
+# Syntetos-Boylan cut-off: average inter-demand interval above this is
+# treated as intermittent demand
+ADI_CUTOFF = 1.32
+
+
+def ses(Y: np.ndarray, periods: int, alpha: float = 0.2) -> np.ndarray:
+    level = Y[:, 0].copy()
+    for t in range(1, Y.shape[1]):
+        level += alpha * (Y[:, t] - level)
+    return np.repeat(level[:, None], periods, axis=1)
+
+
+def holt(Y: np.ndarray, periods: int, alpha: float = 0.2, beta: float = 0.1) -> np.ndarray:
+    level = Y[:, 0].copy()
+    trend = (Y[:, 1] - Y[:, 0]) if Y.shape[1] > 1 else np.zeros(len(Y))
+    for t in range(1, Y.shape[1]):
+        prev = level
+        level = alpha * Y[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev) + (1 - beta) * trend
+    h = np.arange(1, periods + 1)
+    # demand can't go negative
+    return np.maximum(level[:, None] + trend[:, None] * h, 0.0)
+
+
+def croston(Y: np.ndarray, periods: int, alpha: float = 0.1, sba: bool = False) -> np.ndarray:
+    """
+    Croston's method: smooth non-zero demand sizes (z) and the intervals
+    between them (p) separately; forecast z / p. SBA applies the
+    Syntetos-Boylan (1 - alpha / 2) bias correction.
+    """
+    n = len(Y)
+    z = np.zeros(n)
+    p = np.ones(n)
+    q = np.ones(n)
+    seen = np.zeros(n, dtype=bool)
+
+    for t in range(Y.shape[1]):
+        y = Y[:, t]
+        hit = y > 0
+        first = hit & ~seen
+        update = hit & seen
+
+        z[first] = y[first]
+        p[first] = q[first]
+        z[update] += alpha * (y[update] - z[update])
+        p[update] += alpha * (q[update] - p[update])
+
+        seen |= hit
+        q = np.where(hit, 1.0, q + 1.0)
+
+    f = np.where(seen, z / p, 0.0)
+    if sba:
+        f *= 1 - alpha / 2
+    return np.repeat(f[:, None], periods, axis=1)
+
+
+def seasonal_naive(Y: np.ndarray, periods: int, season: int = 7) -> np.ndarray:
+    season = min(season, Y.shape[1])
+    last = Y[:, -season:]
+    return last[:, np.arange(periods) % season]
+
+
+def intermittent_mask(Y: np.ndarray) -> np.ndarray:
+    nonzero = (Y > 0).sum(axis=1)
+    adi = np.where(nonzero > 0, Y.shape[1] / np.maximum(nonzero, 1), np.inf)
+    return adi > ADI_CUTOFF
+
+
+def forecast_matrix(Y: np.ndarray, method: str, periods: int) -> np.ndarray:
+    if method not in FAST_METHODS:
+        raise ValueError(f"Unknown forecast method '{method}', expected one of {FAST_METHODS}")
+    if Y.size == 0:
+        return np.zeros((len(Y), periods))
+
+    if method == "ses":
+        return ses(Y, periods)
+    if method == "holt":
+        return holt(Y, periods)
+    if method == "croston":
+        return croston(Y, periods)
+    if method == "sba":
+        return croston(Y, periods, sba=True)
+    if method == "seasonal_naive":
+        return seasonal_naive(Y, periods)
+
+    # auto: SBA for intermittent items, SES for the rest
+    return np.where(intermittent_mask(Y)[:, None], croston(Y, periods, sba=True), ses(Y, periods))
+
+
+def fast_forecast(
+    matrix: Tuple[np.ndarray, pd.DatetimeIndex, np.ndarray],
+    method: str = "auto",
+    periods: int = 7,
+    item_ids: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    """
+    Long (item_id, date, forecast_units) frame for every item, or only
+    `item_ids`, from a prebuilt demand matrix.
+    """
+    ids, dates, Y = matrix
+    if item_ids is not None:
+        rows = np.flatnonzero(np.isin(ids, np.asarray(item_ids)))
+        ids, Y = ids[rows], Y[rows]
+
+    F = forecast_matrix(Y, method, periods)
+    future = pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=periods) if len(dates) else []
+
+    return pd.DataFrame({
+        "item_id": np.repeat(ids, periods),
+        "date": np.tile(np.asarray(future), len(ids)),
+        "forecast_units": F.ravel(),
+    })
+
+
+# ======================================================
+# HOLDOUT ACCURACY
+# ======================================================
+
+def evaluate_holdout(
+    matrix: Tuple[np.ndarray, pd.DatetimeIndex, np.ndarray],
+    holdout: int = 7,
+    arima_sample: int = 100,
+    seed: int = 42,
+) -> List[Dict]:
+    """
+    Trains on all but the last `holdout` days and scores each method on the
+    held-out days. ARIMA is too slow to fit for every item, so all methods
+    are also scored on the same random sample of `arima_sample` items.
+    """
+    from .analytics import forecast_series
+
+    ids, dates, Y = matrix
+    if holdout < 1:
+        raise ValueError("holdout must be at least 1 day")
+    if Y.shape[1] <= holdout + 1:
+        raise ValueError(f"Need more than {holdout + 1} days of history for a {holdout}-day holdout")
+
+    train, test = Y[:, :-holdout], Y[:, -holdout:]
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(Y), size=min(arima_sample, len(Y)), replace=False)
+
+    def scores(F: np.ndarray, rows) -> Dict[str, float]:
+        err = F[rows] - test[rows]
+        return {"mae": float(np.abs(err).mean()), "rmse": float(np.sqrt((err ** 2).mean()))}
+
+    out = []
+    for method in FAST_METHODS:
+        F = forecast_matrix(train, method, holdout)
+        all_items = scores(F, slice(None))
+        sampled = scores(F, sample)
+        out.append({
+            "method": method,
+            "mae": all_items["mae"], "rmse": all_items["rmse"],
+            "sample_mae": sampled["mae"], "sample_rmse": sampled["rmse"],
+        })
+
+    train_dates = dates[:-holdout]
+    F = np.zeros_like(test)
+    for i in sample:
+        series = pd.Series(train[i], index=train_dates)
+        F[i] = forecast_series(series, holdout)["forecast_units"].to_numpy()
+    sampled = scores(F, sample)
+    out.append({
+        "method": "arima",
+        "mae": None, "rmse": None,
+        "sample_mae": sampled["mae"], "sample_rmse": sampled["rmse"],
+    })
+
+    return out
@@ -0,0 +1,219 @@
+#%%
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import DEMAND_AGGREGATES_PATH
+from .dataset_cache import file_identity
+from .demand_index import DemandIndex
+
+# ======================================================
+# INCREMENTAL DEMAND AGGREGATES
+# ======================================================
+#
+# Running per-item totals kept in step with demand_history as rows are
+# appended, so stockout / promo / shrinkage analytics are O(items):
+#   units, rows, promo_units, promo_rows, shrinkage  -> per item
+#   active_days                                      -> distinct (item, day)
+#   daily_units                                      -> per calendar day
+#
+# State is persisted to DEMAND_AGGREGATES_PATH together with the identity
+# of the demand file it describes. If the file no longer matches (data was
+# regenerated or edited outside ingestion) the state is rebuilt once from
+# the demand index.
+
+ITEM_STATS = ("units", "rows", "promo_units", "promo_rows", "shrinkage", "active_days")
+
+DEMAND_COLUMNS = ["date", "item_id", "units_sold", "channel", "promo_flag", "shrinkage"]
+SHIPMENT_COLUMNS = ["shipment_id", "item_id", "qty", "date_shipped", "date_received", "supplier_id"]
+
+
+def _day_numbers(dates) -> np.ndarray:
+    """
+    Calendar day as days since the epoch.
+    """
+    return pd.DatetimeIndex(dates).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+class DemandAggregates:
+    def __init__(self):
+        self.item_ids = np.array([], dtype=np.int64)
+        self.stats = {k: np.array([], dtype=np.int64) for k in ITEM_STATS}
+        self.active_keys = np.array([], dtype=np.int64)   # sorted item_id << 32 | day
+        self.daily_days = np.array([], dtype=np.int64)     # sorted day numbers
+        self.daily_units = np.array([], dtype=np.int64)
+        self.source: Optional[list] = None                 # identity of the demand file
+
+    # -------------------------------------------
+    # BUILD / UPDATE
+    # -------------------------------------------
+    @classmethod
+    def from_index(cls, index: DemandIndex) -> "DemandAggregates":
+        agg = cls()
+        totals = index.item_totals()
+        agg.item_ids = totals["item_id"].to_numpy(dtype=np.int64)
+        agg.stats = {k: totals[k].to_numpy(dtype=np.int64) for k in ITEM_STATS}
+
+        days = _day_numbers(index.dates)
+        item_pos, day_pos = np.nonzero(index.rows)
+        agg.active_keys = np.sort((agg.item_ids[item_pos] << 32) | days[day_pos])
+
+        per_day = index.units.sum(axis=0)
+        agg.daily_days, inverse = np.unique(days, return_inverse=True)
+        agg.daily_units = np.bincount(inverse, weights=per_day).astype(np.int64)
+        return agg
+
+    def apply(self, rows: pd.DataFrame):
+        """
+        Folds a batch of new demand rows into the running totals.
+        Cost is O(batch + items + distinct item-days), not O(history).
+        """
+        if rows.empty:
+            return
+
+        items = rows["item_id"].to_numpy(dtype=np.int64)
+        units = rows["units_sold"].to_numpy(dtype=np.int64)
+        promo = rows["promo_flag"].to_numpy() == 1
+        days = _day_numbers(rows["date"])
+
+        # new (item, day) pairs extend active_days
+        keys = np.unique((items << 32) | days)
+        new_keys = keys[~np.isin(keys, self.active_keys, assume_unique=True)]
+        self.active_keys = np.union1d(self.active_keys, new_keys)
+
+        batch_ids, inverse = np.unique(items, return_inverse=True)
+        delta = {
+            "units": np.bincount(inverse, weights=units),
+            "rows": np.bincount(inverse),
+            "promo_units": np.bincount(inverse, weights=np.where(promo, units, 0)),
+            "promo_rows": np.bincount(inverse, weights=promo),
+            "shrinkage": np.bincount(inverse, weights=rows["shrinkage"].to_numpy()),
+            "active_days": np.bincount(
+                np.searchsorted(batch_ids, new_keys >> 32), minlength=len(batch_ids)
+            ),
+        }
+
+        all_ids = np.union1d(self.item_ids, batch_ids)
+        old_pos = np.searchsorted(all_ids, self.item_ids)
+        new_pos = np.searchsorted(all_ids, batch_ids)
+        for k in ITEM_STATS:
+            merged = np.zeros(len(all_ids), dtype=np.int64)
+            merged[old_pos] = self.stats[k]
+            merged[new_pos] += delta[k].astype(np.int64)
+            self.stats[k] = merged
+        self.item_ids = all_ids
+
+        batch_days, day_inverse = np.unique(days, return_inverse=True)
+        all_days = np.union1d(self.daily_days, batch_days)
+        merged = np.zeros(len(all_days), dtype=np.int64)
+        merged[np.searchsorted(all_days, self.daily_days)] = self.daily_units
+        merged[np.searchsorted(all_days, batch_days)] += np.bincount(
+            day_inverse, weights=units
+        ).astype(np.int64)
+        self.daily_days, self.daily_units = all_days, merged
+
+    # -------------------------------------------
+    # VIEWS
+    # -------------------------------------------
+    def item_totals(self) -> pd.DataFrame:
+        """
+        One row per item: item_id plus the ITEM_STATS columns.
+        """
+        return pd.DataFrame({"item_id": self.item_ids, **self.stats})
+
+    def daily_totals(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": self.daily_days.astype("datetime64[D]").astype("datetime64[ns]"),
+            "units_sold": self.daily_units,
+        })
+
+    # -------------------------------------------
+    # PERSISTENCE
+    # -------------------------------------------
+    def save(self, path: Path = DEMAND_AGGREGATES_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # per-process temp name: the API and analytics workers may save at once
+        tmp = path.with_suffix(f".{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp,
+            item_ids=self.item_ids,
+            active_keys=self.active_keys,
+            daily_days=self.daily_days,
+            daily_units=self.daily_units,
+            source=np.array(json.dumps(self.source)),
+            **{f"stat_{k}": v for k, v in self.stats.items()},
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEMAND_AGGREGATES_PATH) -> Optional["DemandAggregates"]:
+        try:
+            with np.load(path) as data:
+                agg = cls()
+                agg.item_ids = data["item_ids"]
+                agg.active_keys = data["active_keys"]
+                agg.daily_days = data["daily_days"]
+                agg.daily_units = data["daily_units"]
+                agg.source = json.loads(str(data["source"]))
+                agg.stats = {k: data[f"stat_{k}"] for k in ITEM_STATS}
+                return agg
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+
+# ======================================================
+# INGESTION
+# ======================================================
+
+class DemandIngestor:
+    """
+    Owns the aggregate state and serializes appends against rebuilds, so
+    an append is never counted twice.
+    """
+
+    def __init__(self, path: Path = DEMAND_AGGREGATES_PATH):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._agg: Optional[DemandAggregates] = None
+        self.rebuilds = 0
+
+    def aggregates(self, source_path: Path, build_index) -> DemandAggregates:
+        """
+        Current aggregates for the demand file at `source_path`; rebuilt via
+        `build_index()` only when the stored state doesn't match the file.
+        """
+        ident = list(file_identity(source_path))
+        with self._lock:
+            if self._agg is None or self._agg.source != ident:
+                # another process (e.g. the API's ingest) may have saved newer state
+                self._agg = DemandAggregates.load(self.path)
+            if self._agg is None or self._agg.source != ident:
+                self._agg = DemandAggregates.from_index(build_index())
+                self._agg.source = ident
+                self._agg.save(self.path)
+                self.rebuilds += 1
+            return self._agg
+
+    def ingest(self, rows: pd.DataFrame, source_path: Path, append, build_index) -> Dict:
+        """
+        Appends demand rows with `append(df)` and folds them into the
+        aggregates under one lock.
+        """
+        rows = rows[DEMAND_COLUMNS]
+        with self._lock:
+            agg = self.aggregates(source_path, build_index)
+            append(rows)
+            agg.apply(rows)
+            agg.source = list(file_identity(source_path))
+            agg.save(self.path)
+            return {"rows": len(rows), "items": int(rows["item_id"].nunique())}
+
+
+# Singleton instance
+demand_ingestor = DemandIngestor()
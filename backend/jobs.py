@@ -0,0 +1,159 @@
+#%%
+from datetime import date
+from typing import List, Optional
+
+import pandas as pd
+
+from .analytics import (
+    load_inventory,
+    load_demand,
+    load_suppliers,
+    load_shipments,
+    stockout_risk,
+    excess_inventory,
+    shrinkage_summary,
+    promo_lift,
+    detect_anomalies,
+    detect_anomalies_mad,
+    demand_version,
+    load_item_robust_stats,
+    forecast_item,
+    load_demand_aggregates,
+    load_demand_index,
+    load_demand_matrix,
+    supplier_risk,
+    shipment_delay_summary,
+)
+from .anomaly_model import anomaly_store
+from .fast_forecast import evaluate_holdout, fast_forecast
+from .pagination import After, rank
+
+# ======================================================
+# ANALYTICS JOBS
+# ======================================================
+#
+# The compute half of each analytics endpoint, as plain module-level
+# functions so they can run in the API's worker processes. Arguments and
+# results are picklable (cursors arrive already decoded); errors surface
+# as ValueError. Each worker process keeps its own dataset cache.
+
+
+def _category_items(category: Optional[str]) -> Optional[List[int]]:
+    if category is None:
+        return None
+    inv = load_inventory(columns=["item_id", "category"])
+    return inv.loc[inv["category"] == category, "item_id"].tolist()
+
+
+def _in_date_range(values: pd.Series, start_date: Optional[date], end_date: Optional[date]) -> pd.Series:
+    mask = pd.Series(True, index=values.index)
+    if start_date is not None:
+        mask &= values >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= values < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    return mask
+
+
+# -------------------------------------------
+# INVENTORY / DEMAND
+# -------------------------------------------
+
+def stockout_page(top_n: int, after: Optional[After], category: Optional[str]) -> pd.DataFrame:
+    inv = load_inventory()
+    if category is not None:
+        inv = inv[inv["category"] == category]
+    return stockout_risk(inv, load_demand_aggregates(), top_n=top_n, after=after)
+
+
+def excess_page(top_n: int, after: Optional[After], category: Optional[str]) -> pd.DataFrame:
+    inv = load_inventory()
+    if category is not None:
+        inv = inv[inv["category"] == category]
+    return excess_inventory(inv, top_n=top_n, after=after)
+
+
+def shrinkage_page(top_n: int, after: Optional[After], category: Optional[str]) -> pd.DataFrame:
+    return shrinkage_summary(
+        load_demand_aggregates(), top_n=top_n, after=after, item_ids=_category_items(category)
+    )
+
+
+def promo_lift_page(top_n: int, after: Optional[After], category: Optional[str]) -> pd.DataFrame:
+    return promo_lift(
+        load_demand_aggregates(), top_n=top_n, after=after, item_ids=_category_items(category)
+    )
+
+
+def anomalies_page(
+    mode: str,
+    since: Optional[date],
+    top_n: int,
+    after: Optional[After],
+    item_id: Optional[int],
+    start_date: Optional[date],
+    end_date: Optional[date],
+) -> pd.DataFrame:
+    if mode not in ("isolation", "mad"):
+        raise ValueError(f"Unknown anomaly mode '{mode}'")
+    demand = load_demand()
+    # narrow to the requested rows first; only those are scored
+    rows = demand
+    if item_id is not None:
+        rows = rows[rows["item_id"] == item_id]
+    rows = rows[_in_date_range(rows["date"], start_date, end_date)]
+
+    if mode == "isolation":
+        # the model itself is fitted on (a sample of) the whole history
+        model = anomaly_store.model(demand_version(), demand)
+        df = detect_anomalies(rows, model=model, since=since)
+    else:
+        df = detect_anomalies_mad(rows, load_item_robust_stats(), since=since)
+    return rank(df, None, None, limit=top_n, after=after)
+
+
+def daily_demand() -> pd.DataFrame:
+    return load_demand_aggregates().daily_totals()
+
+
+# -------------------------------------------
+# FORECASTING
+# -------------------------------------------
+
+def forecast_one(item_id: int, periods: int, method: str) -> pd.DataFrame:
+    if method == "arima":
+        return forecast_item(load_demand_index(), item_id, periods)
+    df = fast_forecast(load_demand_matrix(), method, periods, item_ids=[item_id])
+    if df.empty:
+        raise ValueError(f"No demand history for item {item_id}")
+    return df[["date", "forecast_units"]]
+
+
+def forecast_accuracy(holdout: int, arima_sample: int):
+    return evaluate_holdout(load_demand_matrix(), holdout, arima_sample)
+
+
+# -------------------------------------------
+# SUPPLIERS / SHIPMENTS
+# -------------------------------------------
+
+def supplier_risk_page(top_n: int, after: Optional[After], supplier_id: Optional[int]) -> pd.DataFrame:
+    return supplier_risk(
+        load_suppliers(), top_n=top_n, after=after,
+        supplier_ids=None if supplier_id is None else [supplier_id],
+    )
+
+
+def shipment_delays_page(
+    top_n: int,
+    after: Optional[After],
+    supplier_id: Optional[int],
+    start_date: Optional[date],
+    end_date: Optional[date],
+) -> pd.DataFrame:
+    shipments = load_shipments()
+    mask = _in_date_range(shipments["date_shipped"], start_date, end_date)
+    if supplier_id is not None:
+        mask &= shipments["supplier_id"] == supplier_id
+    if not mask.all():
+        shipments = shipments[mask]
+    return shipment_delay_summary(shipments, top_n=top_n, after=after)
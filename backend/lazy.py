@@ -0,0 +1,42 @@
+#%%
+import importlib.util
+import sys
+from types import ModuleType
+
+# ======================================================
+# LAZY IMPORTS
+# ======================================================
+#
+# lazy_import("faiss") returns the module straight away but only executes
+# it on first attribute access, so heavy dependencies (faiss, torch via
+# sentence_transformers, openai) cost nothing when the API is imported and
+# are paid by the first request - or the startup warm-up - that uses them.
+# A missing package raises ModuleNotFoundError on first use instead of at
+# import, so endpoints that don't need it keep working.
+
+
+class _MissingModule(ModuleType):
+    def __getattr__(self, attr):
+        raise ModuleNotFoundError(f"No module named '{self.__name__}'", name=self.__name__)
+
+
+def lazy_import(name: str) -> ModuleType:
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return _MissingModule(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    """
+    Whether `name` has actually been executed (not just lazily registered).
+    """
+    module = sys.modules.get(name)
+    return module is not None and type(module).__name__ != "_LazyModule"
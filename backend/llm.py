@@ -0,0 +1,181 @@
+#%%
+import asyncio
+import random
+import weakref
+from typing import AsyncIterator, Dict, Optional
+
+from .config import (
+    OPENAI_API_KEY,
+    LLM_MODEL,
+    LLM_BACKEND,
+    LLM_TIMEOUT_S,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF_S,
+    LLM_MAX_CONNECTIONS,
+    LLM_STUB_FIRST_TOKEN_MS,
+    LLM_STUB_TOKEN_MS,
+)
+from .lazy import lazy_import
+
+openai = lazy_import("openai")
+
+# ======================================================
+# LLM BACKENDS
+# ======================================================
+#
+# Async, streaming text generation for RAG answers:
+#   OpenAIBackend  one pooled AsyncOpenAI client per event loop, a timeout on
+#                  every request, and retries with exponential backoff +
+#                  jitter for connection errors, timeouts, 429 and 5xx -
+#                  only until the first token has been streamed
+#   StubBackend    local, no network: streams a canned answer at a
+#                  configurable pace, for offline load tests
+#
+# LLM_BACKEND picks one; by default OpenAI when an API key is set, else
+# none (the engine then answers with the retrieved context only).
+
+
+class LLMBackend:
+    name = "base"
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield
+
+    async def complete(self, prompt: str) -> str:
+        return "".join([token async for token in self.stream(prompt)])
+
+    def warm_up(self):
+        """
+        Imports / sets up whatever the first request would wait for.
+        """
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str = OPENAI_API_KEY,
+        model: str = LLM_MODEL,
+        timeout: float = LLM_TIMEOUT_S,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF_S,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.retries = 0
+        # connection pools belong to the loop they were opened on
+        self._clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def client(self) -> "openai.AsyncOpenAI":
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import httpx
+
+            client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=0,  # retried below, only before the first token
+                timeout=self.timeout,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    )
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "model": self.model, "retries": self.retries}
+
+    def warm_up(self):
+        openai.AsyncOpenAI  # executes the lazily imported module (and httpx)
+
+    def _retryable(self, error: Exception) -> bool:
+        return isinstance(error, (
+            openai.APIConnectionError,  # includes APITimeoutError
+            openai.RateLimitError,
+            openai.InternalServerError,
+        ))
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                events = await self.client().responses.create(
+                    model=self.model, input=prompt, stream=True, timeout=self.timeout,
+                )
+                async with events:
+                    async for event in events:
+                        if event.type == "response.output_text.delta":
+                            streamed = True
+                            yield event.delta
+                return
+            except Exception as e:
+                if streamed or attempt >= self.max_retries or not self._retryable(e):
+                    raise
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random() / 2))
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+
+
+class StubBackend(LLMBackend):
+    name = "stub"
+
+    def __init__(
+        self, first_token_ms: float = LLM_STUB_FIRST_TOKEN_MS, token_ms: float = LLM_STUB_TOKEN_MS
+    ):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        answer = (
+            f"[stub LLM] Received a {len(prompt.split())}-word prompt for this question. "
+            "A configured LLM would summarize stockout risk, excess inventory, promotion "
+            "impact, shrinkage, supplier risk and shipment delays from the retrieved reports here."
+        )
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, word in enumerate(answer.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield word if i == 0 else " " + word
+
+
+def make_backend(name: str = LLM_BACKEND) -> Optional[LLMBackend]:
+    """
+    Backend for `name` ("openai", "stub", "none"; "" = openai if an API key
+    is set, else none).
+    """
+    name = name or ("openai" if OPENAI_API_KEY else "none")
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "stub":
+        return StubBackend()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown LLM backend '{name}', expected openai, stub or none")
+
+
+# Singleton instance
+llm_backend = make_backend()
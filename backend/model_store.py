@@ -0,0 +1,184 @@
+#%%
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    FORECAST_MODEL_DIR,
+    FORECAST_STORE_MAX_ENTRIES,
+    FORECAST_STORE_MEMORY_ENTRIES,
+    FORECAST_REFIT_AFTER_DAYS,
+)
+
+# ======================================================
+# FITTED FORECAST MODEL STORE
+# ======================================================
+#
+# One record per item_id, persisted as JSON under FORECAST_MODEL_DIR:
+#   series_hash / n_obs / start  -> identity of the series the state covers
+#   params                       -> fitted ARIMA parameters
+#   appended                     -> days absorbed since the last real fit
+#
+# Lookup for a series:
+#   - same series           -> reuse the results object (or re-filter with
+#                              the stored params if only on disk): no fit
+#   - stored series + new days appended
+#                           -> results.append / filter with stored params,
+#                              or a warm-started fit once `refit_after`
+#                              days have accumulated
+#   - anything else         -> full fit
+#
+# Results objects are kept in a bounded in-memory LRU; records on disk are
+# capped at `max_entries`, evicting the least recently used files.
+
+
+def _series_hash(values: np.ndarray, start) -> str:
+    h = hashlib.sha1(str(start).encode())
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class ForecastModelStore:
+    def __init__(
+        self,
+        root: Path = FORECAST_MODEL_DIR,
+        max_entries: int = FORECAST_STORE_MAX_ENTRIES,
+        memory_entries: int = FORECAST_STORE_MEMORY_ENTRIES,
+        refit_after: int = FORECAST_REFIT_AFTER_DAYS,
+        order: Tuple[int, int, int] = (2, 1, 2),
+    ):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.refit_after = refit_after
+        self.order = tuple(order)
+        self._memory: "OrderedDict[int, Tuple[Dict, Any]]" = OrderedDict()
+        self._disk_count: Optional[int] = None
+        self._lock = threading.Lock()
+        self.counters = {"reused": 0, "updated": 0, "warm_refits": 0, "fits": 0, "evicted": 0}
+
+    # -------------------------------------------
+    # PERSISTENCE
+    # -------------------------------------------
+    def _path(self, item_id: int) -> Path:
+        return self.root / f"{int(item_id)}.json"
+
+    def _read(self, item_id: int) -> Optional[Dict]:
+        path = self._path(item_id)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)  # mtime doubles as last-access time for eviction
+        return record if tuple(record.get("order", ())) == self.order else None
+
+    def _write(self, item_id: int, record: Dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(item_id)
+        existed = path.exists()
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(record, f)
+        tmp.replace(path)
+
+        with self._lock:
+            if self._disk_count is None:
+                self._disk_count = sum(1 for _ in self.root.glob("*.json"))
+            elif not existed:
+                self._disk_count += 1
+            over = self._disk_count - self.max_entries
+        if over > 0:
+            self._evict_disk(over)
+
+    def _evict_disk(self, n: int):
+        files = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime_ns)
+        for p in files[:n]:
+            p.unlink(missing_ok=True)
+            with self._lock:
+                self._memory.pop(int(p.stem), None)
+                self._disk_count -= 1
+                self.counters["evicted"] += 1
+
+    def _remember(self, item_id: int, record: Dict, results):
+        with self._lock:
+            self._memory[item_id] = (record, results)
+            self._memory.move_to_end(item_id)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    # -------------------------------------------
+    # LOOKUP / FIT
+    # -------------------------------------------
+    def fitted(self, item_id: int, series: pd.Series):
+        """
+        ARIMA results for `series`, reusing or updating stored state for
+        `item_id` when the series matches or extends what was fitted before.
+        """
+        # imported on first fit: statsmodels is slow to import
+        from statsmodels.tsa.arima.model import ARIMA
+
+        item_id = int(item_id)
+        values = series.to_numpy(dtype=np.float64)
+        start = str(series.index[0])
+
+        with self._lock:
+            cached = self._memory.get(item_id)
+        record, results = cached if cached else (self._read(item_id), None)
+
+        if record is not None and record["start"] == start:
+            n = record["n_obs"]
+            params = np.asarray(record["params"])
+
+            if n == len(values) and record["series_hash"] == _series_hash(values, start):
+                if results is None:
+                    results = ARIMA(series, order=self.order).filter(params)
+                self.counters["reused"] += 1
+                self._remember(item_id, record, results)
+                return results
+
+            if n < len(values) and record["series_hash"] == _series_hash(values[:n], start):
+                appended = record["appended"] + len(values) - n
+                if appended <= self.refit_after:
+                    if results is not None:
+                        results = results.append(series.iloc[n:], refit=False)
+                    else:
+                        results = ARIMA(series, order=self.order).filter(params)
+                    self.counters["updated"] += 1
+                else:
+                    results = ARIMA(series, order=self.order).fit(start_params=params)
+                    appended = 0
+                    self.counters["warm_refits"] += 1
+                return self._store(item_id, series, values, start, results, appended)
+
+        results = ARIMA(series, order=self.order).fit()
+        self.counters["fits"] += 1
+        return self._store(item_id, series, values, start, results, 0)
+
+    def _store(self, item_id, series, values, start, results, appended):
+        record = {
+            "order": list(self.order),
+            "start": start,
+            "n_obs": len(values),
+            "series_hash": _series_hash(values, start),
+            "params": np.asarray(results.params, dtype=np.float64).tolist(),
+            "appended": appended,
+        }
+        self._write(item_id, record)
+        self._remember(item_id, record, results)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counters, "in_memory": len(self._memory), "on_disk": self._disk_count or 0}
+
+
+# Singleton instance (one per process; records are shared through disk)
+model_store = ForecastModelStore()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from datetime import date, datetime, timezone
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Literal, Union
 
 
 class AnalyticsSummaryResponse(BaseModel):
@@ -10,8 +11,53 @@ class AnalyticsSummaryResponse(BaseModel):
 
 class RAGQueryRequest(BaseModel):
     query: str
+    k: Optional[int] = None           # reports retrieved (default RAG_TOP_K)
+    ef_search: Optional[int] = None   # HNSW search effort for this query
+    nprobe: Optional[int] = None      # IVF lists probed for this query
+    stream: bool = False              # server-sent events instead of one JSON body
 
 
 class RAGQueryResponse(BaseModel):
     answer: str
     retrieved_context: Optional[str] = None
+
+
+class ForecastBatchRequest(BaseModel):
+    item_ids: Union[List[int], Literal["all"]] = "all"
+    periods: int = Field(7, ge=1)
+    method: str = "arima"
+
+
+class DemandRow(BaseModel):
+    date: datetime
+    item_id: int
+    units_sold: int
+    channel: str
+    promo_flag: int = 0
+    shrinkage: int = 0
+
+    @field_validator("date")
+    @classmethod
+    def _naive_utc(cls, value: datetime) -> datetime:
+        # demand_history stores naive timestamps; an offset would turn the
+        # column into strings once appended
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class DemandIngestRequest(BaseModel):
+    rows: List[DemandRow]
+
+
+class ShipmentRow(BaseModel):
+    shipment_id: int
+    item_id: int
+    qty: int
+    date_shipped: date
+    date_received: date
+    supplier_id: int
+
+
+class ShipmentIngestRequest(BaseModel):
+    rows: List[ShipmentRow]
@@ -0,0 +1,118 @@
+#%%
+import base64
+import json
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# RANKING & CURSOR PAGINATION
+# ======================================================
+#
+# Ranked analytics order rows by (sort column, key column): the key makes
+# the order total, so a cursor holding the last row's (value, key) resumes
+# exactly where the previous page stopped. Only the rows that can make the
+# page are fully sorted; the rest are discarded with argpartition.
+
+After = Tuple[Any, Any]
+
+
+def _sortable(values: np.ndarray) -> np.ndarray:
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def rank(
+    df: pd.DataFrame,
+    by: Optional[str],
+    key: Optional[str],
+    ascending: bool = True,
+    limit: Optional[int] = None,
+    after: Optional[After] = None,
+) -> pd.DataFrame:
+    """
+    Rows of `df` ordered by `by` (then `key`, ascending; the row index when
+    key is None), starting after the `after` position, at most `limit` rows.
+    by=None orders by key alone. NaNs in `by` sort last.
+    """
+    keys = df[key].to_numpy() if key else df.index.to_numpy()
+    if by is None:
+        values = np.zeros(len(df))
+    else:
+        values = _sortable(df[by].to_numpy())
+        if not ascending:
+            values = -values
+    values = np.where(np.isnan(values), np.inf, values)
+
+    rows = np.arange(len(df))
+    if after is not None:
+        after_value = 0.0 if by is None else float(_sortable(np.asarray([after[0]]))[0])
+        if by is not None and not ascending:
+            after_value = -after_value
+        after_value = np.inf if np.isnan(after_value) else after_value
+        keep = (values > after_value) | ((values == after_value) & (keys > after[1]))
+        rows = rows[keep]
+
+    if limit is not None and 0 < limit < len(rows):
+        # partial selection: keep everything tied with the limit-th value
+        if by is None:
+            pick = np.argpartition(keys[rows], limit - 1)[:limit]
+        else:
+            part = values[rows]
+            threshold = part[np.argpartition(part, limit - 1)[limit - 1]]
+            pick = np.flatnonzero(part <= threshold)
+        rows = rows[pick]
+
+    order = np.lexsort((keys[rows], values[rows]))
+    rows = rows[order]
+    if limit is not None:
+        rows = rows[:max(limit, 0)]
+    return df.iloc[rows]
+
+
+# ======================================================
+# CURSORS
+# ======================================================
+
+def _plain(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return {"ts": pd.Timestamp(value).isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_cursor(page: pd.DataFrame, by: Optional[str], key: Optional[str]) -> Optional[str]:
+    """
+    Opaque cursor pointing after the last row of `page` (None if empty).
+    """
+    if page.empty:
+        return None
+    last = page.iloc[-1]
+    value = None if by is None else _plain(last[by])
+    k = _plain(last[key] if key else page.index[-1])
+    payload = json.dumps({"by": by, "v": value, "k": k}, allow_nan=True)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str], by: Optional[str]) -> Optional[After]:
+    """
+    (value, key) position from a cursor made by encode_cursor for the same
+    sort column. Raises ValueError on a malformed or mismatched cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, key = data["v"], data["k"]
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if data.get("by") != by:
+        raise ValueError("Cursor belongs to a different ranking")
+
+    def restore(v):
+        return pd.Timestamp(v["ts"]) if isinstance(v, dict) else v
+
+    return restore(value), restore(key)
@@ -0,0 +1,195 @@
+#%%
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    RAG_EMBED_CACHE_SIZE,
+    RAG_ANSWER_CACHE_SIZE,
+    RAG_ANSWER_CACHE_TTL,
+    RAG_ANSWER_CACHE_THRESHOLD,
+)
+
+# ======================================================
+# RAG QUERY CACHES
+# ======================================================
+#
+# QueryEmbeddingCache  LRU of question text -> embedding, so a repeated
+#                      question skips the sentence transformer.
+# AnswerCache          semantic cache of (answer, context): a question whose
+#                      embedding has cosine similarity >= threshold with a
+#                      cached one, asked with the same search parameters
+#                      against the same dataset version, gets the stored
+#                      answer instead of a retrieval + LLM call.
+#                      Entries expire after a TTL; beyond `maxsize` the least
+#                      recently used is evicted; a new dataset version
+#                      clears everything.
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.split())
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
+
+
+class QueryEmbeddingCache:
+    def __init__(self, maxsize: int = RAG_EMBED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, encode: Callable[[str], np.ndarray]) -> np.ndarray:
+        """
+        Embedding of `question`, from the cache or via `encode(question)`.
+        """
+        key = _normalize_question(question)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        embedding = np.asarray(encode(question), dtype=np.float32)
+        if self.maxsize <= 0:
+            return embedding
+        with self._lock:
+            self._entries[key] = embedding
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+            }
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        threshold: float = RAG_ANSWER_CACHE_THRESHOLD,
+        ttl: float = RAG_ANSWER_CACHE_TTL,
+        maxsize: int = RAG_ANSWER_CACHE_SIZE,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # entry id -> (unit embedding, params, (answer, context), stored_at)
+        self._entries: "OrderedDict[int, Tuple]" = OrderedDict()
+        self._ids = itertools.count()
+        self._version: Optional[str] = None
+        self._matrix: Optional[Tuple[np.ndarray, list]] = None  # stacked embeddings
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _sync_version(self, version: str):
+        if version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _expire(self, now: float):
+        stale = [i for i, e in self._entries.items() if now - e[3] > self.ttl]
+        for i in stale:
+            del self._entries[i]
+        if stale:
+            self.expired += len(stale)
+            self._matrix = None
+
+    def lookup(
+        self, embedding: np.ndarray, version: str, params: Hashable = None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        (answer, context) cached for the most similar earlier question, if
+        it is within the threshold; None otherwise.
+        """
+        with self._lock:
+            self._sync_version(version)
+            self._expire(time.monotonic())
+            if self._entries:
+                if self._matrix is None:
+                    ids = list(self._entries)
+                    self._matrix = (np.stack([self._entries[i][0] for i in ids]), ids)
+                matrix, ids = self._matrix
+                sims = matrix @ _unit(embedding)
+                # best match among entries made with the same search parameters
+                for pos in np.argsort(-sims):
+                    if sims[pos] < self.threshold:
+                        break
+                    entry_id = ids[pos]
+                    if self._entries[entry_id][1] == params:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return self._entries[entry_id][2]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: np.ndarray,
+        version: str,
+        answer: Tuple[str, str],
+        params: Hashable = None,
+    ):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                # answered from a snapshot the index has since moved past
+                return
+            self._entries[next(self._ids)] = (_unit(embedding), params, answer, time.monotonic())
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "dataset_version": self._version,
+                "threshold": self.threshold,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": _hit_rate(self.hits, self.misses),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+# Singleton instances
+query_embedding_cache = QueryEmbeddingCache()
+answer_cache = AnswerCache()
@@ -0,0 +1,197 @@
+#%%
+import importlib.util
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    LLM_MODEL,
+    RAG_CONTEXT_FORMAT,
+    RAG_CONTEXT_TOKEN_BUDGET,
+    RAG_LOG_PROMPT_TOKENS,
+)
+from .lazy import lazy_import
+
+tiktoken = lazy_import("tiktoken")
+
+# ======================================================
+# CONTEXT PACKING
+# ======================================================
+#
+# Every retrieved report repeats its title and field labels ("ITEM REPORT:",
+# "Current stock: ..."). In "table" format the packer writes one table per
+# report type instead: labels once as the header, then one row per report
+# in rank order. Columns with the same value in every row are moved to a
+# single line above the table, and duplicate reports are dropped:
+#
+#   ITEM REPORT (3 reports)
+#   Category: Electronics
+#   Item ID | Name | Current stock | ...
+#   12 | Widget | 40 | ...
+#
+# In either format, reports are added in rank order only while the
+# context fits in the token budget. Raising k therefore fills the budget
+# rather than growing the prompt. The top report is always included.
+#
+# Tokens are counted with tiktoken's encoding for LLM_MODEL when it is
+# installed. Without it they are estimated as one per word, number or
+# punctuation mark.
+
+FORMATS = ("table", "raw")
+RAW_SEPARATOR = "\n\n---\n\n"
+
+_HAS_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+Report = Tuple[str, List[Tuple[str, str]]]  # (title, [(label, value), ...])
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> "tiktoken.Encoding":
+    try:
+        return tiktoken.encoding_for_model(LLM_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    if _HAS_TIKTOKEN:
+        return len(_encoding().encode(text))
+    return len(_WORD.findall(text))
+
+
+def parse_report(chunk: str) -> Optional[Report]:
+    """
+    (title, fields) of a "<title>:\n<label>: <value>\n..." report; None for
+    text in any other shape.
+    """
+    title, sep, body = chunk.partition(":\n")
+    fields = [line.partition(": ") for line in body.splitlines() if line]
+    if not sep or "\n" in title or not fields or not all(f[1] for f in fields):
+        return None
+    return title, [(label, value) for label, _, value in fields]
+
+
+def render_table(title: str, labels: List[str], rows: List[List[str]]) -> str:
+    common = [
+        i for i in range(len(labels))
+        if len(rows) > 1 and all(row[i] == rows[0][i] for row in rows)
+    ]
+    columns = [i for i in range(len(labels)) if i not in common]
+    lines = [f"{title} ({len(rows)} report{'s' if len(rows) > 1 else ''})"]
+    lines += [f"{labels[i]}: {rows[0][i]}" for i in common]
+    lines.append(" | ".join(labels[i] for i in columns))
+    lines += [" | ".join(row[i] for i in columns) for row in rows]
+    return "\n".join(lines)
+
+
+def render_tables(chunks: Sequence[str]) -> str:
+    """
+    One table per report type, in order of first appearance; chunks that
+    aren't reports are appended verbatim.
+    """
+    tables: Dict[Tuple[str, Tuple[str, ...]], List[List[str]]] = {}
+    other: List[str] = []
+    for chunk in chunks:
+        report = parse_report(chunk)
+        if report is None:
+            other.append(chunk)
+            continue
+        title, fields = report
+        key = (title, tuple(label for label, _ in fields))
+        # "nan" is how a missing aggregate renders (no demand / shipments yet)
+        tables.setdefault(key, []).append(["-" if v == "nan" else v for _, v in fields])
+    parts = [render_table(title, list(labels), rows) for (title, labels), rows in tables.items()]
+    return RAW_SEPARATOR.join(parts + other)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    reports: int   # reports included
+    dropped: int   # retrieved reports left out to stay within the budget
+
+
+class ContextPacker:
+    def __init__(
+        self,
+        fmt: str = RAG_CONTEXT_FORMAT,
+        budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+        log: bool = RAG_LOG_PROMPT_TOKENS,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown context format '{fmt}', expected one of {FORMATS}")
+        self.fmt = fmt
+        self.budget = budget
+        self.log = log
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.prompt_tokens = 0
+        self.context_tokens = 0
+        self.reports = 0
+        self.dropped = 0
+
+    def render(self, chunks: Sequence[str]) -> str:
+        return render_tables(chunks) if self.fmt == "table" else RAW_SEPARATOR.join(chunks)
+
+    def pack(self, chunks: Sequence[str]) -> PackedContext:
+        """
+        The longest rank-order prefix of `chunks` (deduplicated) whose
+        rendering fits the token budget - at least the first chunk.
+        """
+        chunks = list(dict.fromkeys(chunks))
+        if not chunks:
+            return PackedContext("", 0, 0, 0)
+        # context size grows with the number of reports: binary search
+        best = (1, self.render(chunks[:1]))
+        lo, hi = 2, len(chunks)
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            text = self.render(chunks[:mid])
+            if count_tokens(text) <= self.budget:
+                best = (mid, text)
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        n, text = best
+        return PackedContext(text, count_tokens(text), n, len(chunks) - n)
+
+    def record(self, prompt: str, packed: PackedContext) -> int:
+        """
+        Counts the prompt tokens of one query (printing them if `log`);
+        returns the count.
+        """
+        tokens = count_tokens(prompt)
+        with self._lock:
+            self.queries += 1
+            self.prompt_tokens += tokens
+            self.context_tokens += packed.tokens
+            self.reports += packed.reports
+            self.dropped += packed.dropped
+        if self.log:
+            print(
+                f"[rag] prompt {tokens} tokens (context {packed.tokens}/{self.budget}, "
+                f"{packed.reports} reports, {packed.dropped} over budget)"
+            )
+        return tokens
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = max(self.queries, 1)
+            return {
+                "format": self.fmt,
+                "token_budget": self.budget,
+                "tokenizer": "tiktoken" if _HAS_TIKTOKEN else "estimate",
+                "queries": self.queries,
+                "avg_prompt_tokens": round(self.prompt_tokens / n, 1),
+                "avg_context_tokens": round(self.context_tokens / n, 1),
+                "avg_reports": round(self.reports / n, 2),
+                "dropped_reports": self.dropped,
+            }
+
+
+# Singleton instance
+context_packer = ContextPacker()
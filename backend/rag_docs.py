@@ -0,0 +1,153 @@
+#%%
+import queue
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# RAG REPORT DOCUMENTS
+# ======================================================
+#
+# Item and supplier reports are rendered column-wise: each field is
+# formatted for a whole batch at once with NumPy and the results are
+# spliced into a precompiled template, instead of iterrows() plus per-row
+# f-string formatting.
+# Documents come out in batches so the embedder can start on the first
+# batch while later ones are still being rendered (see prefetch).
+
+DocBatch = Tuple[List[str], List[dict]]
+
+# (label, column, printf spec or None for str()); one line per field
+ITEM_FIELDS = [
+    ("Item ID", "item_id", None),
+    ("Name", "name", None),
+    ("Category", "category", None),
+    ("Current stock", "stock", None),
+    ("Reorder point", "reorder_point", None),
+    ("Unit cost", "unit_cost", None),
+    ("Selling price", "selling_price", None),
+    ("Total units sold", "total_units_sold", None),
+    ("Average daily units sold", "avg_daily_units", "%.2f"),
+    ("Total shrinkage events", "total_shrinkage", None),
+]
+
+SUPPLIER_FIELDS = [
+    ("Supplier ID", "supplier_id", None),
+    ("Name", "supplier_name", None),
+    ("On-time rate", "on_time_rate", None),
+    ("Defect rate", "defect_rate", None),
+    ("Lead time (days)", "lead_time_days", None),
+    ("Total shipments", "total_shipments", None),
+    ("Average shipment quantity", "avg_qty", "%.2f"),
+    ("Average transit days", "avg_transit_days", "%.2f"),
+]
+
+
+def item_frame(inventory: pd.DataFrame, demand: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inventory joined with per-item demand totals: one row per item report.
+    """
+    demand_agg = (
+        demand.groupby("item_id")
+        .agg(
+            total_units_sold=("units_sold", "sum"),
+            avg_daily_units=("units_sold", "mean"),
+            total_shrinkage=("shrinkage", "sum"),
+        )
+        .reset_index()
+    )
+    return inventory.merge(demand_agg, on="item_id", how="left")
+
+
+def supplier_frame(suppliers: pd.DataFrame, shipments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Suppliers joined with shipment stats: one row per supplier report.
+    """
+    ship_agg = (
+        shipments.assign(
+            transit_days=lambda df: (df["date_received"] - df["date_shipped"]).dt.days
+        )
+        .groupby("supplier_id")
+        .agg(
+            total_shipments=("shipment_id", "count"),
+            avg_qty=("qty", "mean"),
+            avg_transit_days=("transit_days", "mean"),
+        )
+        .reset_index()
+    )
+    return suppliers.merge(ship_agg, on="supplier_id", how="left")
+
+
+def _format_column(values: pd.Series, spec: Optional[str]) -> np.ndarray:
+    if spec is not None:
+        return np.char.mod(spec, values.to_numpy(dtype=np.float64)).astype(object)
+    # NumPy's str() of each value, as an f-string would print it (NaN -> "nan")
+    return values.to_numpy().astype(str).astype(object)
+
+
+def render(df: pd.DataFrame, title: str, fields) -> List[str]:
+    """
+    Report text for every row of `df`:
+    "<title>:\n<label>: <value>\n<label>: <value>\n..."
+    """
+    template = f"{title}:\n" + "".join(f"{label}: {{}}\n" for label, _, _ in fields)
+    columns = [_format_column(df[col], spec) for _, col, spec in fields]
+    # values are already strings: this only splices them into the template
+    return [template.format(*values) for values in zip(*columns)]
+
+
+def iter_docs(
+    inventory: pd.DataFrame,
+    demand: pd.DataFrame,
+    suppliers: pd.DataFrame,
+    shipments: pd.DataFrame,
+    batch_size: int,
+) -> Iterator[DocBatch]:
+    """
+    (texts, metainfo) batches: all item reports, then all supplier reports.
+    Item metainfo carries the category, for metadata-filtered retrieval.
+    """
+    sources = [
+        (item_frame(inventory, demand), "ITEM REPORT", ITEM_FIELDS, "item", "item_id",
+         ["category"]),
+        (supplier_frame(suppliers, shipments), "SUPPLIER REPORT", SUPPLIER_FIELDS,
+         "supplier", "supplier_id", []),
+    ]
+    for frame, title, fields, kind, key, extra in sources:
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start:start + batch_size]
+            ids = batch[key].astype(np.int64).tolist()
+            extras = [batch[col].astype(str).tolist() for col in extra]
+            meta = [
+                {"type": kind, key: i, **dict(zip(extra, values))}
+                for i, *values in zip(ids, *extras)
+            ]
+            yield render(batch, title, fields), meta
+
+
+def prefetch(batches: Iterable, depth: int = 2) -> Iterator:
+    """
+    Iterates `batches` on a background thread, up to `depth` ahead, so the
+    consumer (embedding) overlaps with the producer (rendering).
+    """
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for batch in batches:
+                q.put(batch)
+        except Exception as e:  # re-raised in the consumer
+            q.put(e)
+        q.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
@@ -1,172 +1,512 @@
-import pandas as pd
-from typing import List, Tuple
-
-import faiss
-from sentence_transformers import SentenceTransformer
-
-from openai import OpenAI
-
+import asyncio
+import hashlib
+import threading
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+
+from .analytics import (
+    current_dataset_version,
+    load_inventory,
+    load_demand,
+    load_suppliers,
+    load_shipments,
+)
+from .ann_index import (
+    REMOVABLE_TYPES,
+    IndexBuilder,
+    faiss,
+    index_bytes,
+    index_dtype,
+    index_kind,
+    matches_spec,
+    reconstruct,
+    search,
+)
 from .config import (
-    SYNTHETIC_DIR,
-    EMBEDDING_MODEL,
-    OPENAI_API_KEY,
-    LLM_MODEL,
+    RAG_DOC_BATCH_SIZE,
+    RAG_HYBRID_SEARCH,
+    RAG_INDEX_TYPE,
+    RAG_TOP_K,
 )
+from .embedding import Embedder
+from .llm import llm_backend
+from .rag_cache import answer_cache, query_embedding_cache
+from .rag_context import context_packer
+from .rag_docs import iter_docs, prefetch
+from .rag_retrieval import HybridRetriever, QueryFilters
+from .rag_store import rag_index_store
 
 # ======================================================
 # RAG ENGINE
 # ======================================================
+#
+# Every report gets a stable FAISS id derived from what it describes
+# (doc_id) and a hash of its text. Rebuilds re-embed only reports whose
+# hash changed or that are new, and drop ids that no longer exist.
+#
+# The index, report texts and metainfo live in one immutable IndexSnapshot.
+# A query takes a reference to the current snapshot and uses only that; a
+# rebuild works on copies and publishes a new snapshot with a single
+# assignment. When the data changes, a background thread rebuilds while
+# queries keep being answered from the previous snapshot.
+
+DOC_KINDS = {"item": 1, "supplier": 2}
+
+
+def doc_id(meta: dict) -> int:
+    """
+    Stable int64 id: kind code in the high 32 bits, entity id below.
+    """
+    entity = meta["item_id"] if meta["type"] == "item" else meta["supplier_id"]
+    return (DOC_KINDS[meta["type"]] << 32) | int(entity)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """
+    One consistent version of the index and the reports it was built from.
+    Never mutated: a new version is a new snapshot.
+    """
+    index: "faiss.Index"
+    chunks: List[str]
+    metainfo: List[dict]
+    version: str  # dataset version the index was built from
+    positions: Dict[int, int]  # doc_id -> position in chunks
+    retriever: HybridRetriever  # metadata + BM25 (built on first use) over chunks
+
+    @classmethod
+    def create(
+        cls, index: "faiss.Index", chunks: List[str], metainfo: List[dict], version: str
+    ) -> "IndexSnapshot":
+        positions = {m["doc_id"]: pos for pos, m in enumerate(metainfo)}
+        return cls(index, chunks, metainfo, version, positions, HybridRetriever(chunks, metainfo))
+
+
+@dataclass
+class PreparedQuery:
+    """
+    Retrieved context and prompt for one question, plus what's needed to
+    cache its answer; `cached` is set when the answer cache already has one.
+    """
+    context: str
+    prompt: str
+    q_emb: np.ndarray
+    version: str
+    params: Hashable
+    cached: Optional[str] = None
+    prompt_tokens: int = 0
 
 
 class RAGEngine:
     def __init__(self):
-        self.model = SentenceTransformer(EMBEDDING_MODEL)
-        self.index = None
-        self.chunks: List[str] = []
-        self.metainfo: List[dict] = []
-        self.client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+        self.embedder = Embedder()
+        self.snapshot: Optional[IndexSnapshot] = None
+        self.last_build: Dict[str, int] = {}
+        self.warmup: Dict[str, object] = {}  # step -> seconds, see warm_up()
+        self.llm = llm_backend
+        self._lock = threading.RLock()  # index load / build; not taken by queries
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._rebuild_force = False
+        self.rebuilds: Dict[str, object] = {"state": "idle", "runs": 0, "failures": 0}
 
     # -------------------------------------------
     # DATA LOADING
     # -------------------------------------------
     def _load_data(self):
-        inventory = pd.read_csv(SYNTHETIC_DIR / "inventory.csv")
-        demand = pd.read_csv(SYNTHETIC_DIR / "demand_history.csv", parse_dates=["date"])
-        suppliers = pd.read_csv(SYNTHETIC_DIR / "supplier.csv")
-        shipments = pd.read_csv(
-            SYNTHETIC_DIR / "shipments.csv",
-            parse_dates=["date_shipped", "date_received"],
-        )
-        return inventory, demand, suppliers, shipments
+        return load_inventory(), load_demand(), load_suppliers(), load_shipments()
 
     # -------------------------------------------
-    # DOCUMENT CREATION (TEXT CHUNKS)
+    # INDEX BUILDING
     # -------------------------------------------
-    def _build_item_docs(self, inventory: pd.DataFrame, demand: pd.DataFrame) -> List[Tuple[str, dict]]:
-        docs = []
-
-        demand_agg = (
-            demand.groupby("item_id")
-            .agg(
-                total_units_sold=("units_sold", "sum"),
-                avg_daily_units=("units_sold", "mean"),
-                total_shrinkage=("shrinkage", "sum"),
-            )
-            .reset_index()
-        )
-
-        inv = inventory.merge(demand_agg, on="item_id", how="left")
-
-        for _, row in inv.iterrows():
-            text = (
-                f"ITEM REPORT:\n"
-                f"Item ID: {int(row['item_id'])}\n"
-                f"Name: {row['name']}\n"
-                f"Category: {row['category']}\n"
-                f"Current stock: {row['stock']}\n"
-                f"Reorder point: {row['reorder_point']}\n"
-                f"Unit cost: {row['unit_cost']}\n"
-                f"Selling price: {row['selling_price']}\n"
-                f"Total units sold: {row.get('total_units_sold', 0)}\n"
-                f"Average daily units sold: {row.get('avg_daily_units', 0):.2f}\n"
-                f"Total shrinkage events: {row.get('total_shrinkage', 0)}\n"
-            )
-            meta = {"type": "item", "item_id": int(row["item_id"])}
-            docs.append((text, meta))
-
-        return docs
-
-    def _build_supplier_docs(
-        self, suppliers: pd.DataFrame, shipments: pd.DataFrame
-    ) -> List[Tuple[str, dict]]:
-        docs = []
-
-        # basic shipment stats per supplier
-        ship_agg = (
-            shipments.assign(
-                transit_days=lambda df: (df["date_received"] - df["date_shipped"]).dt.days
-            )
-            .groupby("supplier_id")
-            .agg(
-                total_shipments=("shipment_id", "count"),
-                avg_qty=("qty", "mean"),
-                avg_transit_days=("transit_days", "mean"),
-            )
-            .reset_index()
+    def _previous(self) -> Optional[Tuple]:
+        """
+        The index to update: the one in memory, else the persisted one
+        built with the same model, whatever its dataset version.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            bundle = (snapshot.index, snapshot.chunks, snapshot.metainfo)
+        else:
+            bundle = rag_index_store.load(None, self.embedder.name)
+        # indexes saved before doc ids existed can't be updated in place
+        if bundle is None or not all("doc_id" in m for m in bundle[2]):
+            return None
+        return bundle
+
+    def build_index_from_data(self, version: str = None) -> Dict[str, int]:
+        """
+        Brings the index up to date with the data, re-embedding only new
+        or changed reports. Reports are rendered in batches on a background
+        thread while earlier batches are embedded.
+        Returns reused / encoded / removed counts.
+
+        The previous index is updated in place when it already has the
+        configured type and vector dtype and supports removals. Otherwise
+        (HNSW, or the config changed) a new index is built, reusing the
+        stored vectors of unchanged reports. Either way the result is
+        published as a new snapshot; queries meanwhile use the old one.
+        """
+        version = version or current_dataset_version()
+        batches = iter_docs(*self._load_data(), batch_size=RAG_DOC_BATCH_SIZE)
+
+        previous = self._previous()
+        old_hash = {m["doc_id"]: m["hash"] for m in previous[2]} if previous else {}
+        old_ids = np.fromiter(old_hash, dtype=np.int64, count=len(old_hash))
+        in_place = (
+            previous is not None
+            and RAG_INDEX_TYPE in REMOVABLE_TYPES
+            and matches_spec(previous[0])
         )
+        # work on a copy: queries keep using the current index meanwhile
+        index = faiss.clone_index(previous[0]) if in_place else None
+        builder = None if in_place else IndexBuilder(RAG_INDEX_TYPE)
+
+        texts: List[str] = []
+        metainfo: List[dict] = []
+        encoded = 0
+        with self.embedder.session():
+            for batch_texts, batch_meta in prefetch(batches):
+                batch_meta = [
+                    {**m, "doc_id": doc_id(m), "hash": text_hash(t)}
+                    for t, m in zip(batch_texts, batch_meta)
+                ]
+                texts.extend(batch_texts)
+                metainfo.extend(batch_meta)
+
+                ids = np.array([m["doc_id"] for m in batch_meta], dtype=np.int64)
+                changed = np.array([m["hash"] != old_hash.get(m["doc_id"]) for m in batch_meta])
+
+                if builder is not None and previous is not None and not changed.all():
+                    builder.add(ids[~changed], reconstruct(previous[0], ids[~changed]))
+                if not changed.any():
+                    continue
+
+                embeddings = self.embedder.encode(
+                    [t for t, c in zip(batch_texts, changed) if c]
+                )
+                if builder is not None:
+                    builder.add(ids[changed], embeddings)
+                else:
+                    index.remove_ids(ids[changed & np.isin(ids, old_ids)])
+                    index.add_with_ids(embeddings, ids[changed])
+                encoded += int(changed.sum())
+
+        if not texts:
+            raise ValueError("No documents available to build RAG index.")
 
-        sup = suppliers.merge(ship_agg, on="supplier_id", how="left")
-
-        for _, row in sup.iterrows():
-            text = (
-                f"SUPPLIER REPORT:\n"
-                f"Supplier ID: {int(row['supplier_id'])}\n"
-                f"Name: {row['supplier_name']}\n"
-                f"On-time rate: {row['on_time_rate']}\n"
-                f"Defect rate: {row['defect_rate']}\n"
-                f"Lead time (days): {row['lead_time_days']}\n"
-                f"Total shipments: {row.get('total_shipments', 0)}\n"
-                f"Average shipment quantity: {row.get('avg_qty', 0):.2f}\n"
-                f"Average transit days: {row.get('avg_transit_days', 0):.2f}\n"
-            )
-            meta = {"type": "supplier", "supplier_id": int(row["supplier_id"])}
-            docs.append((text, meta))
-
-        return docs
+        # reports whose item / supplier no longer exists
+        stale = set(old_hash).difference(m["doc_id"] for m in metainfo)
+        if builder is not None:
+            index = builder.finish()
+        elif stale:
+            index.remove_ids(np.fromiter(stale, dtype=np.int64))
+
+        snapshot = IndexSnapshot.create(index, texts, metainfo, version)
+        if RAG_HYBRID_SEARCH:
+            snapshot.retriever.bm25  # built here rather than by the first query
+        self.snapshot = snapshot
+        rag_index_store.save(index, texts, metainfo, version, self.embedder.name)
+
+        self.last_build = {
+            "documents": len(texts),
+            "reused": len(texts) - encoded,
+            "encoded": encoded,
+            "removed": len(stale),
+        }
+        return self.last_build
+
+    def load_index(self, version: str = None) -> bool:
+        """
+        Loads the persisted index if it matches the current dataset version,
+        embedding model and index settings. Returns whether it did.
+        """
+        version = version or current_dataset_version()
+        bundle = rag_index_store.load(version, self.embedder.name)
+        if (
+            bundle is None
+            or not all("doc_id" in m for m in bundle[2])
+            or not matches_spec(bundle[0])
+        ):
+            return False
+        self.snapshot = IndexSnapshot.create(*bundle, version)
+        return True
 
     # -------------------------------------------
-    # INDEX BUILDING
+    # BACKGROUND REBUILD
     # -------------------------------------------
-    def build_index_from_data(self):
-        inventory, demand, suppliers, shipments = self._load_data()
-
-        docs_items = self._build_item_docs(inventory, demand)
-        docs_suppliers = self._build_supplier_docs(suppliers, shipments)
-
-        docs_all = docs_items + docs_suppliers
-
-        if not docs_all:
-            raise ValueError("No documents available to build RAG index.")
-
-        texts = [d[0] for d in docs_all]
-        metainfo = [d[1] for d in docs_all]
-
-        embeddings = self.model.encode(texts)
-        dim = embeddings.shape[1]
-
-        index = faiss.IndexFlatL2(dim)
-        index.add(embeddings)
-
-        self.index = index
-        self.chunks = texts
-        self.metainfo = metainfo
+    def request_rebuild(self, trigger: str, force: bool = False) -> Dict:
+        """
+        Starts a background rebuild if the index is behind the data (or
+        always, with force). A rebuild already running re-checks the data
+        when it finishes, so changes made meanwhile are picked up by a
+        follow-up run rather than a second thread. Returns rebuild status.
+        """
+        with self._rebuild_lock:
+            self._rebuild_force |= force
+            if self._rebuild_thread is None:
+                self.rebuilds.update(state="running", trigger=trigger)
+                self._rebuild_thread = threading.Thread(
+                    target=self._rebuild, name="rag-rebuild", daemon=True
+                )
+                self._rebuild_thread.start()
+            return dict(self.rebuilds)
+
+    def _rebuild(self):
+        while True:
+            version = current_dataset_version()
+            with self._rebuild_lock:
+                snapshot = self.snapshot
+                done = (snapshot is not None and snapshot.version == version) or (
+                    # don't retry a failed build on every query; new data or force does
+                    self.rebuilds.get("failed_version") == version
+                )
+                if done and not self._rebuild_force:
+                    self._rebuild_thread = None
+                    self.rebuilds["state"] = "idle"
+                    return
+                self._rebuild_force = False
+                self.rebuilds["state"] = "running"
+
+            t0 = time.perf_counter()
+            try:
+                with self._lock:
+                    self.build_index_from_data(version)
+            except Exception as e:
+                print(f"[rag] background rebuild failed: {e}")
+                with self._rebuild_lock:
+                    self.rebuilds["failures"] += 1
+                    self.rebuilds.update(failed_version=version, error=str(e))
+                continue
+            seconds = round(time.perf_counter() - t0, 3)
+            print(f"[rag] rebuilt index for dataset {version} in {seconds}s: {self.last_build}")
+            with self._rebuild_lock:
+                self.rebuilds["runs"] += 1
+                self.rebuilds.update(
+                    last_version=version, last_seconds=seconds, failed_version=None, error=None
+                )
+
+    def rebuild_status(self) -> Dict:
+        with self._rebuild_lock:
+            return dict(self.rebuilds)
+
+    def stats(self) -> Dict:
+        snapshot = self.snapshot
+        index = snapshot.index if snapshot is not None else None
+        return {
+            "dataset_version": snapshot.version if snapshot is not None else None,
+            "documents": len(snapshot.chunks) if snapshot is not None else 0,
+            "index_type": index_kind(index) if index is not None else None,
+            "vector_dtype": index_dtype(index) if index is not None else None,
+            "embedding_model": self.embedder.name,
+            "index_bytes": index_bytes(index) if index is not None else 0,
+            "last_build": self.last_build,
+            "rebuild": self.rebuild_status(),
+        }
+
+    def cache_stats(self) -> Dict:
+        return {
+            "query_embeddings": query_embedding_cache.stats(),
+            "answers": answer_cache.stats(),
+            "context": context_packer.stats(),
+            "llm": {"backend": "none"} if self.llm is None else self.llm.stats(),
+        }
+
+    def ensure_index(self) -> IndexSnapshot:
+        """
+        Snapshot to answer from. If the data has changed since it was
+        built, a background rebuild is started and the current snapshot
+        keeps serving until the new one replaces it. Only with no index in
+        memory yet is one loaded (persisted) or built before answering.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            if snapshot.version != current_dataset_version():
+                self.request_rebuild("query on changed data")
+            return snapshot
+        with self._lock:
+            if self.snapshot is None:
+                version = current_dataset_version()
+                if not self.load_index(version):
+                    self.build_index_from_data(version)
+            return self.snapshot
+
+    def warm_up(self):
+        """
+        Pays the cold-start costs ahead of the first query: loads the
+        persisted index (if it matches the data), the embedding model and
+        the LLM client library. Step timings (or the error) are kept in self.warmup;
+        a failed step is left to the first query to retry.
+        """
+        steps = [
+            ("index", self._warm_index),
+            ("embedding_model", lambda: self.embedder.model),
+            ("retriever", lambda: self.snapshot is not None and self.snapshot.retriever.bm25),
+            ("llm_client", lambda: self.llm is not None and self.llm.warm_up()),
+        ]
+        for step, run in steps:
+            t0 = time.perf_counter()
+            try:
+                run()
+                self.warmup[step] = round(time.perf_counter() - t0, 3)
+            except Exception as e:
+                self.warmup[step] = f"failed: {e}"
+
+    def _warm_index(self):
+        with self._lock:
+            if self.snapshot is None:
+                self.load_index()
 
     # -------------------------------------------
     # QUERY
     # -------------------------------------------
-    def query(self, question: str, k: int = 5) -> Tuple[str, str]:
+    def embed_question(self, question: str) -> np.ndarray:
         """
-        Returns (answer, context_text)
+        (1, dim) embedding of a question, via the LRU query-embedding cache.
         """
-        if self.index is None or not self.chunks:
-            self.build_index_from_data()
-
-        q_emb = self.model.encode([question])
-        D, I = self.index.search(q_emb, k)
-
-        retrieved_chunks = [self.chunks[i] for i in I[0]]
-        context = "\n\n---\n\n".join(retrieved_chunks)
-
-        # No API key: fallback to context-only mode
-        if not self.client:
-            answer = (
-                "RAG engine is active but no LLM API key is configured.\n\n"
-                "Here is the retrieved supply chain context:\n\n"
-                f"{context}"
-            )
-            return answer, context
+        return query_embedding_cache.get(question, lambda q: self.embedder.encode([q]))
+
+    def prepare(
+        self,
+        question: str,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> PreparedQuery:
+        """
+        Retrieval and prompt for a question (blocking: embedding + search).
+        k reports (default RAG_TOP_K) are retrieved and packed into the
+        context token budget. ef_search / nprobe override the configured
+        search effort of HNSW / IVF indexes. A near-identical earlier
+        question against the same data, naming the same items / suppliers
+        / category, comes back with its cached answer.
+        """
+        k = k or RAG_TOP_K
+        snapshot = self.ensure_index()
+        version = snapshot.version
+
+        q_emb = self.embed_question(question)
+        filters = snapshot.retriever.parse(question) if RAG_HYBRID_SEARCH else QueryFilters()
+        # "item 12" and "item 13" embed almost identically: the filters
+        # keep their cached answers apart
+        params = (k, ef_search, nprobe, filters)
+        cached = answer_cache.lookup(q_emb, version, params)
+        if cached is not None:
+            return PreparedQuery(cached[1], "", q_emb, version, params, cached=cached[0])
+
+        positions = self.retrieve(snapshot, question, q_emb, filters, k, ef_search, nprobe)
+        packed = context_packer.pack([snapshot.chunks[p] for p in positions])
+        prompt = self._prompt(question, packed.text)
+        tokens = context_packer.record(prompt, packed)
+        return PreparedQuery(packed.text, prompt, q_emb, version, params, prompt_tokens=tokens)
+
+    def _remember(self, prepared: PreparedQuery, answer: str):
+        answer_cache.store(
+            prepared.q_emb, prepared.version, (answer, prepared.context), prepared.params
+        )
 
-        prompt = f"""
+    async def answer(
+        self,
+        question: str,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[str, str]:
+        """
+        Returns (answer, context_text). Retrieval runs on a worker thread;
+        the LLM call is awaited, so no thread is held while it generates.
+        """
+        prepared = await asyncio.to_thread(self.prepare, question, k, ef_search, nprobe)
+        if prepared.cached is not None:
+            return prepared.cached, prepared.context
+        if self.llm is None:
+            answer = _context_only_answer(prepared.context)
+        else:
+            answer = await self.llm.complete(prepared.prompt)
+        self._remember(prepared, answer)
+        return answer, prepared.context
+
+    async def stream(
+        self,
+        question: str,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        (event, data) pairs: "context" with the retrieved reports, "token"
+        for each piece of the answer as the LLM produces it, then "done".
+        The answer is cached only once it has been streamed completely.
+        """
+        prepared = await asyncio.to_thread(self.prepare, question, k, ef_search, nprobe)
+        yield "context", {
+            "retrieved_context": prepared.context, "prompt_tokens": prepared.prompt_tokens,
+        }
+
+        if prepared.cached is not None:
+            yield "token", {"text": prepared.cached}
+            yield "done", {"cached": True}
+            return
+
+        if self.llm is None:
+            parts = [_context_only_answer(prepared.context)]
+            yield "token", {"text": parts[0]}
+        else:
+            parts = []
+            async for token in self.llm.stream(prepared.prompt):
+                parts.append(token)
+                yield "token", {"text": token}
+        self._remember(prepared, "".join(parts))
+        yield "done", {"cached": False}
+
+    def query(
+        self,
+        question: str,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[str, str]:
+        """
+        Blocking answer(), for scripts; inside an event loop await answer().
+        """
+        return asyncio.run(self.answer(question, k, ef_search, nprobe))
+
+    def retrieve(
+        self,
+        snapshot: IndexSnapshot,
+        question: str,
+        q_emb: np.ndarray,
+        filters: QueryFilters,
+        k: int,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Positions (in snapshot.chunks) of the k reports to answer from:
+        hybrid retrieval when enabled, else plain dense search.
+        """
+        def dense(ids: Optional[np.ndarray], n: int) -> List[int]:
+            _, I = search(snapshot.index, q_emb, n, ef_search=ef_search, nprobe=nprobe, ids=ids)
+            # FAISS returns doc ids (-1 pads when n exceeds the candidates)
+            return [snapshot.positions[i] for i in I[0] if i != -1]
+
+        if not RAG_HYBRID_SEARCH:
+            return dense(None, k)
+        return snapshot.retriever.retrieve(question, filters, dense, k)
+
+    def _prompt(self, question: str, context: str) -> str:
+        layout = (
+            "\nThe context lists the retrieved reports as tables, one per report type;\n"
+            "a field given above a table applies to every row in it.\n"
+            if context_packer.fmt == "table" else ""
+        )
+        return f"""
 You are an expert retail supply chain and inventory analyst.
 
 Use the context below, which includes item-level and supplier-level summaries,
@@ -175,7 +515,7 @@ to answer the business question in clear, concise, actionable language.
 If something is uncertain, say so explicitly. Prioritize insights and recommendations
 around stockout risk, excess inventory, promotion impact, shrinkage, supplier risk,
 and shipment delays.
-
+{layout}
 Context:
 {context}
 
@@ -185,27 +525,14 @@ Question:
 Answer as if you are advising a retail operations director.
 """
 
-        response = self.client.responses.create(
-            model=LLM_MODEL,
-            input=prompt,
-        )
 
-        # Try to pull text cleanly, fallback if structure differs
-        answer_text = None
-        try:
-            # new Responses API style
-            if hasattr(response, "output") and response.output:
-                content = response.output[0].content[0]
-                answer_text = getattr(content, "text", None) or str(content)
-            elif hasattr(response, "output_text"):
-                answer_text = response.output_text
-        except Exception:
-            pass
-
-        if not answer_text:
-            answer_text = str(response)
-
-        return answer_text, context
+def _context_only_answer(context: str) -> str:
+    # No LLM backend: answer with the retrieved context
+    return (
+        "RAG engine is active but no LLM API key is configured.\n\n"
+        "Here is the retrieved supply chain context:\n\n"
+        f"{context}"
+    )
 
 
 # Singleton instance
@@ -0,0 +1,223 @@
+#%%
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import RAG_FUSION_CANDIDATES, RAG_RRF_K
+
+# ======================================================
+# HYBRID RETRIEVAL
+# ======================================================
+#
+# Questions are parsed for explicit references before any vector search:
+#   "item 4312", "supplier 87", "items 12, 13 and 14"  -> exact reports,
+#                                                         ranked first
+#   "supplier(s)" / "item(s)", a known category        -> only reports of
+#                                                         that type / category
+#                                                         are searched
+# The (filtered) reports are then searched twice - dense vectors through the
+# ANN index with an id selector, and BM25 over the report text, which
+# catches names, ids and numbers that embeddings blur - and the two rankings
+# are merged with reciprocal rank fusion.
+
+DenseSearch = Callable[[Optional[np.ndarray], int], List[int]]
+
+_ENTITY_REF = re.compile(
+    r"\b(item|sku|product|supplier|vendor)s?(?:[\s_-]*ids?)?[\s:#]*"
+    r"(\d+(?:\s*(?:,|&|and|or)\s*#?\d+)*)",
+    re.IGNORECASE,
+)
+_ENTITY_TYPE = {"item": "item", "sku": "item", "product": "item",
+                "supplier": "supplier", "vendor": "supplier"}
+_TYPE_WORDS = {
+    "item": re.compile(r"\b(?:items?|skus?|products?)\b", re.IGNORECASE),
+    "supplier": re.compile(r"\b(?:suppliers?|vendors?)\b", re.IGNORECASE),
+}
+_CATEGORY_LINE = re.compile(r"^Category: (.*)$", re.MULTILINE)
+_TOKEN = r"[a-z0-9]+"
+
+
+@dataclass(frozen=True)
+class QueryFilters:
+    entities: Tuple[Tuple[str, int], ...] = ()   # explicit (type, id) references
+    doc_type: Optional[str] = None
+    category: Optional[str] = None
+
+
+# ------------------------------------------------------
+# METADATA INDEX
+# ------------------------------------------------------
+class MetadataIndex:
+    """
+    Report positions by (type, entity id), by type and by item category.
+    """
+
+    def __init__(self, chunks: Sequence[str], metainfo: Sequence[dict]):
+        self.entities: Dict[Tuple[str, int], int] = {}
+        by_type: Dict[str, List[int]] = {}
+        by_category: Dict[str, List[int]] = {}
+        for pos, meta in enumerate(metainfo):
+            kind = meta["type"]
+            self.entities[(kind, int(meta[f"{kind}_id"]))] = pos
+            by_type.setdefault(kind, []).append(pos)
+            if kind == "item":
+                category = meta.get("category")
+                if category is None:  # indexes built before metainfo had it
+                    match = _CATEGORY_LINE.search(chunks[pos])
+                    category = match.group(1) if match else None
+                if category:
+                    by_category.setdefault(category, []).append(pos)
+        self.by_type = {k: np.array(v, dtype=np.int64) for k, v in by_type.items()}
+        self.by_category = {k: np.array(v, dtype=np.int64) for k, v in by_category.items()}
+        self._category_patterns = {
+            c: re.compile(rf"\b{re.escape(c)}s?\b", re.IGNORECASE) for c in self.by_category
+        }
+
+    def parse(self, question: str) -> QueryFilters:
+        entities = []
+        for word, numbers in _ENTITY_REF.findall(question):
+            kind = _ENTITY_TYPE[word.lower()]
+            entities.extend((kind, int(n)) for n in re.findall(r"\d+", numbers))
+
+        category = next(
+            (c for c, pattern in self._category_patterns.items() if pattern.search(question)),
+            None,
+        )
+        types = {k for k, pattern in _TYPE_WORDS.items() if pattern.search(question)}
+        types.update(kind for kind, _ in entities)
+        if category is not None:
+            doc_type = "item"
+        else:
+            doc_type = types.pop() if len(types) == 1 else None
+        return QueryFilters(tuple(dict.fromkeys(entities)), doc_type, category)
+
+    def exact(self, filters: QueryFilters) -> List[int]:
+        return [self.entities[e] for e in filters.entities if e in self.entities]
+
+    def subset(self, filters: QueryFilters) -> Optional[np.ndarray]:
+        """
+        Positions matching the type / category filters; None for all.
+        """
+        if filters.category is not None:
+            return self.by_category[filters.category]
+        if filters.doc_type is not None:
+            return self.by_type.get(filters.doc_type, np.array([], dtype=np.int64))
+        return None
+
+
+# ------------------------------------------------------
+# BM25
+# ------------------------------------------------------
+class BM25Index:
+    """
+    Okapi BM25 over lower-cased alphanumeric tokens. Postings are stored
+    as flat arrays sorted by term: (doc, tf) for term t live in
+    [starts[t], starts[t + 1]).
+    """
+
+    def __init__(self, chunks: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.n_docs = len(chunks)
+        tokens = pd.Series(chunks, dtype=object).str.lower().str.findall(_TOKEN)
+        self.lengths = tokens.str.len().to_numpy(dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if self.n_docs else 0.0
+
+        flat = tokens.explode().dropna()
+        codes, vocab = pd.factorize(flat.to_numpy())
+        pairs, tf = np.unique(
+            codes.astype(np.int64) * self.n_docs + flat.index.to_numpy(dtype=np.int64),
+            return_counts=True,
+        )
+        terms = pairs // self.n_docs if self.n_docs else pairs
+        self.docs = (pairs - terms * self.n_docs).astype(np.int64)
+        self.tf = tf.astype(np.float32)
+        self.starts = np.searchsorted(terms, np.arange(len(vocab) + 1))
+        df = np.diff(self.starts)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.vocab = {term: i for i, term in enumerate(vocab)}
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(re.findall(_TOKEN, query.lower())):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.starts[t], self.starts[t + 1]
+            docs, tf = self.docs[lo:hi], self.tf[lo:hi]
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.avg_length)
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def top(self, query: str, n: int, subset: Optional[np.ndarray] = None) -> List[int]:
+        scores = self.scores(query)
+        candidates = np.arange(self.n_docs) if subset is None else subset
+        s = scores[candidates]
+        n = min(n, len(candidates))
+        if n == 0:
+            return []
+        best = np.argpartition(-s, n - 1)[:n]
+        best = best[np.argsort(-s[best], kind="stable")]
+        return candidates[best[s[best] > 0]].tolist()
+
+
+def fuse(rankings: Sequence[Sequence[int]], rrf_k: int = RAG_RRF_K) -> List[int]:
+    """
+    Reciprocal rank fusion: score(d) = sum over rankings of 1 / (rrf_k + rank).
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, pos in enumerate(ranking, start=1):
+            scores[pos] = scores.get(pos, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# ------------------------------------------------------
+# RETRIEVER
+# ------------------------------------------------------
+class HybridRetriever:
+    def __init__(self, chunks: Sequence[str], metainfo: Sequence[dict]):
+        self.metadata = MetadataIndex(chunks, metainfo)
+        self.doc_ids = np.array([m["doc_id"] for m in metainfo], dtype=np.int64)
+        self._chunks = chunks
+        self._bm25: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+
+    @property
+    def bm25(self) -> BM25Index:
+        with self._lock:
+            if self._bm25 is None:
+                self._bm25 = BM25Index(self._chunks)
+            return self._bm25
+
+    def parse(self, question: str) -> QueryFilters:
+        return self.metadata.parse(question)
+
+    def retrieve(
+        self,
+        question: str,
+        filters: QueryFilters,
+        dense: DenseSearch,
+        k: int,
+        candidates: int = RAG_FUSION_CANDIDATES,
+    ) -> List[int]:
+        """
+        Positions of the top-k reports: explicitly referenced ones first,
+        then the fused dense + BM25 ranking within the filtered subset.
+        `dense(doc_ids or None, n)` returns positions from the vector index.
+        """
+        exact = self.metadata.exact(filters)
+        if len(exact) >= k:
+            return exact[:k]
+
+        subset = self.metadata.subset(filters)
+        n = max(candidates, k)
+        fused = fuse([
+            dense(None if subset is None else self.doc_ids[subset], n),
+            self.bm25.top(question, n, subset),
+        ])
+        seen = set(exact)
+        return (exact + [p for p in fused if p not in seen])[:k]
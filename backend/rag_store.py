@@ -0,0 +1,110 @@
+#%%
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .ann_index import TRAINED_TYPES, faiss, index_dtype, index_kind
+from .config import RAG_INDEX_DIR
+
+# ======================================================
+# PERSISTED RAG INDEX
+# ======================================================
+#
+# The FAISS index, chunk texts and per-chunk metainfo are saved under
+# RAG_INDEX_DIR together with a manifest naming the dataset version and
+# embedding model they were built from. A process start loads them
+# (index memory-mapped) instead of re-embedding every report; they are
+# rebuilt only when either tag no longer matches.
+#
+#   index.faiss     FAISS index
+#   chunks.json     chunk texts, in index order
+#   metainfo.json   one dict per chunk
+#   manifest.json   tags + counts, written last (its presence marks a
+#                   complete save)
+
+IndexBundle = Tuple["faiss.Index", List[str], List[dict]]
+
+
+class RAGIndexStore:
+    def __init__(self, root: Path = RAG_INDEX_DIR):
+        self.root = Path(root)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    def manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _replace(self, name: str, write):
+        tmp = self.root / f"{name}.tmp"
+        write(tmp)
+        tmp.replace(self.root / name)
+
+    def _dump_json(self, name: str, obj):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(obj, f)
+        self._replace(name, write)
+
+    def save(
+        self,
+        index: "faiss.Index",
+        chunks: List[str],
+        metainfo: List[dict],
+        dataset_version: str,
+        model_name: str,
+    ):
+        self.root.mkdir(parents=True, exist_ok=True)
+        # no manifest while the files are being swapped: a crash leaves "no index"
+        self.manifest_path.unlink(missing_ok=True)
+
+        self._replace("index.faiss", lambda p: faiss.write_index(index, str(p)))
+        self._dump_json("chunks.json", chunks)
+        self._dump_json("metainfo.json", metainfo)
+        self._dump_json("manifest.json", {
+            "dataset_version": dataset_version,
+            "embedding_model": model_name,
+            "index_type": index_kind(index),
+            "vector_dtype": index_dtype(index),
+            "count": index.ntotal,
+            "dim": index.d,
+            "built_at": time.time(),
+        })
+
+    def load(self, dataset_version: Optional[str], model_name: str) -> Optional[IndexBundle]:
+        """
+        (index, chunks, metainfo) if a complete save with matching tags
+        exists, else None. dataset_version=None accepts any version (the
+        starting point of an incremental rebuild).
+        """
+        manifest = self.manifest()
+        if (
+            manifest is None
+            or manifest["embedding_model"] != model_name
+            or dataset_version not in (None, manifest["dataset_version"])
+        ):
+            return None
+
+        # flat / hnsw vectors are memory-mapped; mmapped IVF lists can't be
+        # cloned for incremental updates, so IVF (compact anyway) is read in
+        flags = 0
+        if manifest.get("index_type", "flat") not in TRAINED_TYPES:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(str(self.root / "index.faiss"), flags)
+        with open(self.root / "chunks.json") as f:
+            chunks = json.load(f)
+        with open(self.root / "metainfo.json") as f:
+            metainfo = json.load(f)
+        if index.ntotal != len(chunks) or len(chunks) != len(metainfo):
+            return None
+        return index, chunks, metainfo
+
+
+# Singleton instance
+rag_index_store = RAGIndexStore()
@@ -0,0 +1,149 @@
+#%%
+import io
+import json
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is the fallback
+    orjson = None
+
+# ======================================================
+# RESPONSE SERIALIZATION
+# ======================================================
+#
+# Analytics tables are encoded column by column with NumPy instead of
+# DataFrame.to_dict(orient="records") + FastAPI's generic encoder.
+#
+#   json     records, [{col: value, ...}, ...] (default, unchanged shape)
+#   columns  columnar JSON, {col: [values, ...], ...}
+#   ndjson   one record per line, streamed in chunks
+#   arrow    Apache Arrow IPC stream (requires pyarrow)
+#   parquet  Parquet file bytes (requires pyarrow)
+#
+# The format comes from ?format=... or else the Accept header. NaN / inf
+# become null and timestamps ISO 8601 strings in the JSON formats.
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columns": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+ACCEPT_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+ARROW_FORMATS = ("arrow", "parquet")
+NDJSON_CHUNK_ROWS = 10000
+
+
+def negotiate(fmt: Optional[str], accept: Optional[str]) -> str:
+    """
+    Response format from an explicit `fmt`, else the first Accept media type
+    we can produce, else "json". Raises ValueError for formats that are
+    unknown or need a missing optional dependency.
+    """
+    if fmt is None:
+        fmt = "json"
+        for part in (accept or "").split(","):
+            media = part.split(";")[0].strip().lower()
+            if media in ACCEPT_FORMATS:
+                fmt = ACCEPT_FORMATS[media]
+                break
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {sorted(MEDIA_TYPES)}")
+    if fmt in ARROW_FORMATS:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError(f"format '{fmt}' requires pyarrow, which is not installed")
+    return fmt
+
+
+# -------------------------------------------
+# JSON ENCODING
+# -------------------------------------------
+
+def _column_values(values: np.ndarray) -> List:
+    """
+    One column as JSON-ready Python values.
+    """
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]")
+        whole = values[~np.isnat(values)].astype(np.int64) % 1_000_000_000 == 0
+        text = np.datetime_as_string(values, unit="s" if whole.all() else "us")
+        return np.where(np.isnat(values), None, text).tolist()
+    if np.issubdtype(values.dtype, np.floating):
+        out = values.astype(object)
+        out[~np.isfinite(values)] = None
+        return out.tolist()
+    if values.dtype == object:
+        return [None if v is None or v is pd.NaT or v != v else v for v in values.tolist()]
+    return values.tolist()
+
+
+def columns_of(df: pd.DataFrame) -> Dict[str, List]:
+    return {col: _column_values(df[col].to_numpy()) for col in df.columns}
+
+
+def records_of(df: pd.DataFrame) -> List[Dict]:
+    cols = columns_of(df)
+    names = list(cols)
+    return [dict(zip(names, row)) for row in zip(*cols.values())]
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _ndjson_chunks(df: pd.DataFrame, chunk_rows: int) -> Iterator[bytes]:
+    for start in range(0, len(df), chunk_rows):
+        records = records_of(df.iloc[start:start + chunk_rows])
+        yield b"".join(dumps(r) + b"\n" for r in records)
+
+
+# -------------------------------------------
+# ARROW / PARQUET
+# -------------------------------------------
+
+def _arrow_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buf = io.BytesIO()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, buf)
+    else:
+        with pa.ipc.new_stream(buf, table.schema) as writer:
+            writer.write_table(table)
+    return buf.getvalue()
+
+
+def render(df: pd.DataFrame, fmt: str = "json", headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    `df` encoded as a negotiated format (see negotiate).
+    """
+    media_type = MEDIA_TYPES[fmt]
+    if fmt == "ndjson":
+        return StreamingResponse(
+            _ndjson_chunks(df, NDJSON_CHUNK_ROWS), media_type=media_type, headers=headers
+        )
+    if fmt in ARROW_FORMATS:
+        body = _arrow_bytes(df, fmt)
+    elif fmt == "columns":
+        body = dumps(columns_of(df))
+    else:
+        body = dumps(records_of(df))
+    return Response(content=body, media_type=media_type, headers=headers)
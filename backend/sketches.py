@@ -0,0 +1,301 @@
+#%%
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# ======================================================
+# MERGEABLE STREAMING SKETCHES
+# ======================================================
+#
+# Each sketch is updated one chunk (NumPy array) at a time and can be
+# merged with another sketch of the same kind, so summaries can be built
+# chunk-wise, in parallel, or extended with appended rows.
+#
+#   Moments        exact count / mean / variance / min / max (Chan merge)
+#   KLLSketch      approximate quantiles, O(k log(n / k)) memory
+#   HyperLogLog    approximate distinct count, 2^p one-byte registers
+#   MisraGries     heavy hitters with counts under-estimated by <= n / (k + 1)
+
+
+class Moments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        other = Moments()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other: "Moments"):
+        if other.count == 0:
+            return
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        # sample standard deviation, as in DataFrame.describe
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float("nan")
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch. Level h holds items of weight 2^h; when a level
+    exceeds its capacity it is sorted and every other item (random offset)
+    is promoted to the next level.
+    """
+
+    def __init__(self, k: int = 400, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            buf = self.levels[level]
+            if len(buf) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buf = np.sort(buf)
+                keep = buf[:len(buf) % 2]  # an odd item out stays at this level
+                buf = buf[len(keep):]
+                promoted = buf[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64)])
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, buf in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], buf])
+        self.n += other.n
+        self._compress()
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        items = np.concatenate(self.levels)
+        if len(items) == 0:
+            return [float("nan")] * len(qs)
+        weights = np.concatenate([np.full(len(b), 2.0 ** h) for h, b in enumerate(self.levels)])
+        order = np.argsort(items)
+        items, cum = items[order], np.cumsum(weights[order])
+        pos = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+        return items[np.minimum(pos, len(items) - 1)].tolist()
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    # exact for uint64: split into 32-bit halves, which float64 holds exactly
+    hi = (x >> np.uint64(32)).astype(np.float64)
+    lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, 32 + np.frexp(hi)[1], np.frexp(lo)[1])
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        h = pd.util.hash_array(np.asarray(values, dtype=object))
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h << np.uint64(self.p)
+        rho = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        e = alpha * self.m ** 2 / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int((self.registers == 0).sum())
+        if e <= 2.5 * self.m and zeros:
+            e = self.m * np.log(self.m / zeros)  # linear counting for small cardinalities
+        return int(round(e))
+
+
+class MisraGries:
+    def __init__(self, k: int = 1024):
+        self.k = k
+        self.counts: Counter = Counter()
+
+    def _prune(self):
+        if len(self.counts) <= self.k:
+            return
+        cut = sorted(self.counts.values(), reverse=True)[self.k]
+        self.counts = Counter({v: c - cut for v, c in self.counts.items() if c > cut})
+
+    def update(self, values: np.ndarray):
+        codes, uniques = pd.factorize(values)
+        self.update_counts(uniques, np.bincount(codes, minlength=len(uniques)))
+
+    def update_counts(self, values: Sequence, counts: np.ndarray):
+        """
+        Adds pre-aggregated (value, count) pairs, e.g. from a factorized chunk.
+        """
+        if len(values) == 0:
+            return
+        self.counts.update(dict(zip(values, counts.tolist())))
+        self._prune()
+
+    def merge(self, other: "MisraGries"):
+        self.counts.update(other.counts)
+        self._prune()
+
+    def top(self, n: int = 1) -> List:
+        return self.counts.most_common(n)
+
+
+# ======================================================
+# COLUMN / TABLE SUMMARIES
+# ======================================================
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+class ColumnSummary:
+    """
+    describe()-style statistics for one column, kind "numeric",
+    "datetime" or "text".
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.nulls = 0
+        if kind == "text":
+            self.count = 0
+            self.distinct = HyperLogLog()
+            self.heavy = MisraGries()
+        else:
+            self.moments = Moments()
+            self.quantiles = KLLSketch()
+
+    @staticmethod
+    def kind_of(series: pd.Series) -> str:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return "datetime"
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return "numeric"
+        return "text"
+
+    def update(self, series: pd.Series):
+        nulls = series.isna()
+        self.nulls += int(nulls.sum())
+        present = series[~nulls]
+        if self.kind == "text":
+            # factorize once: both sketches only see the chunk's distinct values
+            codes, uniques = pd.factorize(present.astype(str).to_numpy(dtype=object))
+            self.count += len(codes)
+            self.distinct.update(uniques)
+            self.heavy.update_counts(uniques, np.bincount(codes, minlength=len(uniques)))
+            return
+        if self.kind == "datetime":
+            values = pd.to_datetime(present).to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        else:
+            values = present.to_numpy(dtype=np.float64)
+        self.moments.update(values)
+        self.quantiles.update(values)
+
+    def merge(self, other: "ColumnSummary"):
+        self.nulls += other.nulls
+        if self.kind == "text":
+            self.count += other.count
+            self.distinct.merge(other.distinct)
+            self.heavy.merge(other.heavy)
+        else:
+            self.moments.merge(other.moments)
+            self.quantiles.merge(other.quantiles)
+
+    def describe(self) -> Dict:
+        if self.kind == "text":
+            top = self.heavy.top(1)
+            out = {"count": self.count, "unique": min(self.distinct.estimate(), self.count)}
+            if top:
+                out["top"], out["freq"] = top[0][0], int(top[0][1])
+            return out
+
+        m = self.moments
+        if m.count == 0:
+            return {"count": 0}
+        q = dict(zip(("25%", "50%", "75%"), self.quantiles.quantiles(QUANTILES)))
+        if self.kind == "datetime":
+            ts = lambda v: pd.Timestamp(int(v)).isoformat()
+            return {
+                "count": m.count, "mean": ts(m.mean), "min": ts(m.min),
+                **{k: ts(v) for k, v in q.items()}, "max": ts(m.max),
+            }
+        out = {"count": m.count, "mean": m.mean, "std": m.std, "min": m.min, **q, "max": m.max}
+        return {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in out.items()}
+
+
+class TableSummary:
+    def __init__(self):
+        self.rows = 0
+        self.columns: Dict[str, ColumnSummary] = {}
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnSummary(ColumnSummary.kind_of(chunk[col]))
+            self.columns[col].update(chunk[col])
+
+    def merge(self, other: "TableSummary"):
+        self.rows += other.rows
+        for col, summary in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(summary)
+            else:
+                self.columns[col] = summary
+
+    def to_response(self) -> Dict:
+        """
+        Same shape as analytics_summary: shape, per-column summary, null counts.
+        """
+        return {
+            "shape": [self.rows, len(self.columns)],
+            "summary": {col: s.describe() for col, s in self.columns.items()},
+            "null_counts": {col: s.nulls for col, s in self.columns.items()},
+        }
+
+
+def summarize_chunks(chunks, summary: Optional[TableSummary] = None) -> TableSummary:
+    summary = summary or TableSummary()
+    for chunk in chunks:
+        summary.update(chunk)
+    return summary
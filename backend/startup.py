@@ -0,0 +1,170 @@
+#%%
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from .lazy import is_loaded
+
+# ======================================================
+# COLD START
+# ======================================================
+#
+# Heavy dependencies are imported lazily (see lazy.py and the function-level
+# statsmodels / sklearn imports), so importing the API loads only FastAPI,
+# pandas and NumPy. warm_up() then pays the remaining costs on a
+# background thread after startup: the RAG index and embedding model, the
+# LLM client, and the model-fitting libraries.
+#
+# Run as a script it reports import and startup times in a fresh
+# interpreter and fails when they exceed the given limits or when a heavy
+# module is loaded during startup - a guard against cold-start regressions:
+#
+#   python -m backend.startup --max-import-s 2 --max-startup-s 3
+
+HEAVY_MODULES = (
+    "faiss", "sentence_transformers", "torch", "openai",
+    "statsmodels", "sklearn", "scipy",
+)
+
+_warmup: Dict[str, object] = {}
+
+
+def warm_up():
+    """
+    Loads what the first RAG query / model fit would otherwise wait for.
+    Meant to run on a daemon thread; never raises.
+    """
+    from .rag_engine import rag_engine
+
+    t0 = time.perf_counter()
+    _warmup["state"] = "running"
+    rag_engine.warm_up()
+    try:
+        t = time.perf_counter()
+        import sklearn.ensemble  # noqa: F401
+        import statsmodels.tsa.arima.model  # noqa: F401
+        _warmup["model_libraries"] = round(time.perf_counter() - t, 3)
+    except Exception as e:
+        _warmup["model_libraries"] = f"failed: {e}"
+    _warmup["rag"] = rag_engine.warmup
+    _warmup["total"] = round(time.perf_counter() - t0, 3)
+    _warmup["state"] = "done"
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_stats() -> Dict:
+    return {
+        "warm_up": dict(_warmup) or {"state": "not started"},
+        "loaded_modules": {m: is_loaded(m) for m in HEAVY_MODULES},
+    }
+
+
+# ======================================================
+# REPORT
+# ======================================================
+
+# runs in a fresh interpreter with warm-up off, so only import + startup
+# work is measured
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import backend.api as api
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+from backend.lazy import is_loaded
+from backend.startup import HEAVY_MODULES
+t2 = time.perf_counter()
+with TestClient(api.app) as client:
+    t3 = time.perf_counter()
+    client.get("/health")
+    t4 = time.perf_counter()
+    loaded = [m for m in HEAVY_MODULES if is_loaded(m)]
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t3 - t2,
+    "first_health_ms": (t4 - t3) * 1000,
+    "loaded_after_startup": loaded,
+}))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _run(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    root = Path(__file__).resolve().parent.parent
+    return subprocess.run(
+        [sys.executable, *args], cwd=root, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def slowest_imports(top: int, env: Dict[str, str]) -> List[Dict]:
+    """
+    Top-level packages imported by `import backend.api`, by cumulative time.
+    """
+    err = _run(["-X", "importtime", "-c", "import backend.api"], env).stderr
+    # a package's own line carries the cumulative time of its submodules
+    packages = {
+        name: int(cumulative_us)
+        for _, cumulative_us, _, name in _IMPORTTIME.findall(err)
+        if "." not in name and name not in ("backend", "encodings", "site")
+    }
+    ranked = sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+    return [{"package": p, "ms": round(us / 1000, 1)} for p, us in ranked]
+
+
+def report(top: int = 10) -> Dict:
+    env = {**os.environ, "WARMUP_ON_STARTUP": "0"}
+    probe = json.loads(_run(["-c", _PROBE], env).stdout.strip().splitlines()[-1])
+    return {
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in probe.items()},
+        "slowest_imports": slowest_imports(top, env),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report API import / startup time.")
+    parser.add_argument("--max-import-s", type=float, default=None)
+    parser.add_argument("--max-startup-s", type=float, default=None)
+    parser.add_argument(
+        "--forbid", default=",".join(HEAVY_MODULES),
+        help="modules that must not be loaded once startup completes ('' to allow all)",
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    result = report(args.top)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import backend.api   {result['import_s']:.3f}s")
+        print(f"startup (lifespan)   {result['startup_s']:.3f}s")
+        print(f"first /health        {result['first_health_ms']:.1f}ms")
+        print(f"loaded after startup {', '.join(result['loaded_after_startup']) or '-'}")
+        print("slowest imports:")
+        for row in result["slowest_imports"]:
+            print(f"  {row['package']:<24}{row['ms']:>8.1f}ms")
+
+    failures = []
+    if args.max_import_s is not None and result["import_s"] > args.max_import_s:
+        failures.append(f"import took {result['import_s']:.3f}s > {args.max_import_s}s")
+    if args.max_startup_s is not None and result["startup_s"] > args.max_startup_s:
+        failures.append(f"startup took {result['startup_s']:.3f}s > {args.max_startup_s}s")
+    forbidden = set(filter(None, args.forbid.split(","))) & set(result["loaded_after_startup"])
+    if forbidden:
+        failures.append(f"loaded during startup: {', '.join(sorted(forbidden))}")
+    for failure in failures:
+        print(f"[startup] FAIL {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,305 @@
+#%%
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import SYNTHETIC_DIR, COLUMNAR_DIR, STORAGE_FORMAT
+
+# ======================================================
+# TABLE STORAGE
+# ======================================================
+#
+# Two interchangeable backends for the four synthetic tables:
+#   - "csv": the original text files (still what the frontend reads)
+#   - "npy": one .npy file per column, memory-mapped on load so a reader
+#            only touches the columns it asks for
+#
+# Each backend exposes `identity_path(table)`: the file whose mtime/size
+# changes whenever the table is rewritten (used as the dataset cache key).
+
+TABLES = {
+    "inventory": {"csv": "inventory.csv", "dates": []},
+    "demand_history": {"csv": "demand_history.csv", "dates": ["date"]},
+    "suppliers": {"csv": "supplier.csv", "dates": []},
+    "shipments": {"csv": "shipments.csv", "dates": ["date_shipped", "date_received"]},
+}
+
+# Appends read the current file / schema and write after it, so concurrent
+# appends to one table (ingestion handlers run on FastAPI's threadpool)
+# must not overlap. Reentrant, so callers can hold it across an append plus
+# their own bookkeeping.
+_TABLE_LOCKS = {table: threading.RLock() for table in TABLES}
+
+
+def table_lock(table: str) -> threading.RLock:
+    """
+    Lock serializing appends to `table` within this process.
+    """
+    return _TABLE_LOCKS[table]
+
+
+class CsvStore:
+    name = "csv"
+
+    def __init__(self, root: Path = SYNTHETIC_DIR):
+        self.root = Path(root)
+
+    def identity_path(self, table: str) -> Path:
+        return self.root / TABLES[table]["csv"]
+
+    def write(self, table: str, df: pd.DataFrame) -> Path:
+        path = self.identity_path(table)
+        df.to_csv(path, index=False)
+        return path
+
+    def read(self, table: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        dates = TABLES[table]["dates"]
+        if columns is not None:
+            dates = [c for c in dates if c in columns]
+        # ISO8601: generated and appended rows may use different timestamp precision
+        return pd.read_csv(
+            self.identity_path(table), usecols=columns, parse_dates=dates, date_format="ISO8601"
+        )
+
+    def iter_chunks(self, table: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        The table in order, at most `chunk_rows` rows at a time.
+        """
+        yield from pd.read_csv(
+            self.identity_path(table), parse_dates=TABLES[table]["dates"],
+            date_format="ISO8601", chunksize=chunk_rows,
+        )
+
+    def append(self, table: str, df: pd.DataFrame) -> Path:
+        path = self.identity_path(table)
+        with table_lock(table):
+            df.to_csv(path, mode="a", header=not path.exists(), index=False)
+        return path
+
+
+class NpyStore:
+    """
+    Columnar layout: <root>/<table>/<column>.npy plus a _schema.json listing
+    column order, dtypes and row segments. Appends add one segment file per
+    column (<column>.<id>.npy) instead of rewriting the table; the newest
+    segment is merged into the one before it whenever it has at least as
+    many rows, so a table keeps O(log rows) segments and a row is copied
+    O(log rows) times over its life. The schema is written last, so its
+    identity only changes once every file it names is in place - a full
+    rewrite also goes to new files, published by the schema swap. Files a
+    write leaves unreferenced are deleted by the next write, not while a
+    reader may still be opening them.
+    """
+    name = "npy"
+
+    def __init__(self, root: Path = COLUMNAR_DIR):
+        self.root = Path(root)
+
+    def table_dir(self, table: str) -> Path:
+        return self.root / table
+
+    def identity_path(self, table: str) -> Path:
+        return self.table_dir(table) / "_schema.json"
+
+    def segment_path(self, table: str, col: str, seg_id: int) -> Path:
+        name = f"{col}.npy" if seg_id == 0 else f"{col}.{seg_id}.npy"
+        return self.table_dir(table) / name
+
+    def schema(self, table: str) -> Dict:
+        with open(self.identity_path(table)) as f:
+            return json.load(f)
+
+    @staticmethod
+    def segments(schema: Dict) -> List[Dict]:
+        # schemas written before appends were segmented: one base file
+        return schema.get("segments") or [{"id": 0, "rows": schema["rows"]}]
+
+    def _collect(self, table: str):
+        """
+        Deletes the files the current schema lists as obsolete.
+        """
+        if not self.identity_path(table).exists():
+            return
+        for name in self.schema(table).get("obsolete", []):
+            (self.table_dir(table) / name).unlink(missing_ok=True)
+
+    @staticmethod
+    def _to_array(series: pd.Series, is_date: bool) -> np.ndarray:
+        if is_date:
+            return pd.to_datetime(series).to_numpy(dtype="datetime64[ns]")
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            # fixed-width unicode keeps string columns mmap-able
+            return series.astype(str).to_numpy(dtype=np.str_)
+        return series.to_numpy()
+
+    def replacement_segment(self, table: str) -> Tuple[int, List[str]]:
+        """
+        For rewriting a whole table under live readers: a segment id no
+        current file uses, and the file names the rewrite makes obsolete.
+        New columns go to that id and are published by write_schema.
+        """
+        self.table_dir(table).mkdir(parents=True, exist_ok=True)
+        if not self.identity_path(table).exists():
+            return 0, []
+        self._collect(table)
+        schema = self.schema(table)
+        segments = self.segments(schema)
+        obsolete = [
+            self.segment_path(table, c["name"], seg["id"]).name
+            for c in schema["columns"] for seg in segments
+        ]
+        return max(seg["id"] for seg in segments) + 1, obsolete
+
+    def write(self, table: str, df: pd.DataFrame) -> Path:
+        dates = TABLES[table]["dates"]
+        seg_id, obsolete = self.replacement_segment(table)
+
+        columns = []
+        for col in df.columns:
+            arr = self._to_array(df[col], col in dates)
+            np.save(self.segment_path(table, col, seg_id), arr, allow_pickle=False)
+            columns.append({"name": col, "dtype": arr.dtype.str})
+
+        return self.write_schema(
+            table, columns, len(df), [{"id": seg_id, "rows": len(df)}], obsolete
+        )
+
+    def write_schema(
+        self,
+        table: str,
+        columns: List[Dict],
+        rows: int,
+        segments: Optional[List[Dict]] = None,
+        obsolete: Sequence[str] = (),
+    ) -> Path:
+        schema_path = self.identity_path(table)
+        tmp = schema_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "rows": rows,
+                "columns": columns,
+                "segments": segments or [{"id": 0, "rows": rows}],
+                "obsolete": list(obsolete),
+                "written_at": time.time_ns(),
+            }, f)
+        tmp.replace(schema_path)
+        return schema_path
+
+    def append(self, table: str, df: pd.DataFrame) -> Path:
+        """
+        Writes `df` as a new segment of each column; cost depends on the
+        batch (plus amortized merges), not on the size of the table.
+        """
+        with table_lock(table):
+            return self._append(table, df)
+
+    def _append(self, table: str, df: pd.DataFrame) -> Path:
+        if not self.identity_path(table).exists():
+            return self.write(table, df)
+
+        self._collect(table)
+        schema = self.schema(table)
+        dates = TABLES[table]["dates"]
+        segments = self.segments(schema)
+        seg_id = max(seg["id"] for seg in segments) + 1
+
+        columns = []
+        for c in schema["columns"]:
+            name = c["name"]
+            arr = self._to_array(df[name], name in dates)
+            np.save(self.segment_path(table, name, seg_id), arr, allow_pickle=False)
+            dtype = np.promote_types(np.dtype(c["dtype"]), arr.dtype)
+            columns.append({"name": name, "dtype": dtype.str})
+
+        segments, obsolete = self._merge(table, columns, segments + [{"id": seg_id, "rows": len(df)}])
+        return self.write_schema(table, columns, schema["rows"] + len(df), segments, obsolete)
+
+    def _merge(self, table: str, columns: List[Dict], segments: List[Dict]):
+        """
+        Merges trailing segments while the newest is at least as large as
+        the one before it. Returns the new segment list and the file names
+        it no longer references.
+        """
+        obsolete = []
+        next_id = segments[-1]["id"] + 1
+        while len(segments) > 1 and segments[-1]["rows"] >= segments[-2]["rows"]:
+            pair = segments[-2:]
+            for c in columns:
+                paths = [self.segment_path(table, c["name"], seg["id"]) for seg in pair]
+                merged = np.concatenate([np.load(p, mmap_mode="r") for p in paths])
+                np.save(self.segment_path(table, c["name"], next_id), merged, allow_pickle=False)
+                obsolete.extend(p.name for p in paths)
+            segments = segments[:-2] + [{"id": next_id, "rows": pair[0]["rows"] + pair[1]["rows"]}]
+            next_id += 1
+        return segments, obsolete
+
+    def _column(self, table: str, schema: Dict, col: str, mmap: bool) -> np.ndarray:
+        mode = "r" if mmap else None
+        parts = [
+            np.load(self.segment_path(table, col, seg["id"]), mmap_mode=mode)
+            for seg in self.segments(schema)
+        ]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def read(
+        self, table: str, columns: Optional[Sequence[str]] = None, mmap: bool = True
+    ) -> pd.DataFrame:
+        schema = self.schema(table)
+        names = [c["name"] for c in schema["columns"]]
+        if columns is not None:
+            missing = set(columns) - set(names)
+            if missing:
+                raise KeyError(f"{table} has no columns {sorted(missing)}")
+            names = [c for c in names if c in columns]
+
+        # a single segment stays memory-mapped; several are concatenated
+        data = {c: self._column(table, schema, c, mmap) for c in names}
+        return pd.DataFrame(data, copy=False)
+
+    def iter_chunks(self, table: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """
+        Row slices of the memory-mapped columns, segment by segment; only
+        one chunk is paged in at a time.
+        """
+        schema = self.schema(table)
+        for seg in self.segments(schema):
+            data = {
+                c["name"]: np.load(self.segment_path(table, c["name"], seg["id"]), mmap_mode="r")
+                for c in schema["columns"]
+            }
+            for start in range(0, seg["rows"], chunk_rows):
+                yield pd.DataFrame({c: arr[start:start + chunk_rows] for c, arr in data.items()})
+
+
+STORES = {"csv": CsvStore, "npy": NpyStore}
+
+
+def get_store(fmt: str = STORAGE_FORMAT):
+    if fmt not in STORES:
+        raise ValueError(f"Unknown storage format '{fmt}', expected one of {sorted(STORES)}")
+    return STORES[fmt]()
+
+
+# ======================================================
+# CONVERTER
+# ======================================================
+
+def convert_csv_to_columnar(tables: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    One-shot conversion of the existing CSV tables into the npy layout.
+    """
+    src, dst = CsvStore(), NpyStore()
+    out = {}
+    for table in tables or list(TABLES):
+        out[table] = str(dst.write(table, src.read(table)))
+    return out
+
+
+if __name__ == "__main__":
+    for table, path in convert_csv_to_columnar().items():
+        print(f"{table}: {path}")
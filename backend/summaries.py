@@ -0,0 +1,67 @@
+#%%
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from .config import SUMMARY_CHUNK_ROWS
+from .dataset_cache import FileIdentity, file_identity
+from .sketches import TableSummary, summarize_chunks
+from .storage import get_store
+
+# ======================================================
+# TABLE SUMMARY ENGINE
+# ======================================================
+#
+# The /analytics/*-summary payloads are built once per table version by
+# streaming the table through mergeable sketches, one chunk at a time, so
+# the full table is never materialized. Rows appended through ingestion are
+# folded into the existing sketches instead of triggering a rescan.
+
+
+class SummaryEngine:
+    def __init__(self, store=None, chunk_rows: int = SUMMARY_CHUNK_ROWS):
+        self.store = store or get_store()
+        self.chunk_rows = chunk_rows
+        self._summaries: Dict[str, Tuple[FileIdentity, TableSummary]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.extends = 0
+
+    def summary(self, table: str) -> Dict:
+        """
+        shape / summary / null_counts for `table`, rebuilt only when the
+        table on disk no longer matches the cached sketches.
+        """
+        path = self.store.identity_path(table)
+        with self._lock:
+            ident = file_identity(path)
+            entry = self._summaries.get(table)
+            if entry is None or entry[0] != ident:
+                sketch = summarize_chunks(self.store.iter_chunks(table, self.chunk_rows))
+                entry = self._summaries[table] = (ident, sketch)
+                self.builds += 1
+            return entry[1].to_response()
+
+    def extend(self, table: str, rows: pd.DataFrame, before: Optional[FileIdentity]):
+        """
+        Merges appended `rows` into the sketches of `table`, provided they
+        describe the file as it was before the append (`before`).
+        Otherwise the next summary() rebuilds from disk.
+        """
+        path = self.store.identity_path(table)
+        with self._lock:
+            entry = self._summaries.get(table)
+            if entry is None or entry[0] != before:
+                return
+            entry[1].merge(summarize_chunks([rows]))
+            self._summaries[table] = (file_identity(path), entry[1])
+            self.extends += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"tables": sorted(self._summaries), "builds": self.builds, "extends": self.extends}
+
+
+# Singleton instance
+summary_engine = SummaryEngine()
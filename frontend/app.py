@@ -135,8 +135,10 @@ with tab_demand:
     df_demand = pd.read_csv("data/synthetic/demand_history.csv", parse_dates=["date"])
 
     st.markdown("### Daily Demand Trend")
-    daily = df_demand.groupby("date")["units_sold"].sum().reset_index()
-    st.line_chart(daily.set_index("date"))
+    daily = pd.DataFrame(requests.get(f"{API_BASE}/analytics/daily-demand").json())
+    if not daily.empty:
+        daily["date"] = pd.to_datetime(daily["date"])
+        st.line_chart(daily.set_index("date"))
 
     st.markdown("### Promo vs Non-Promo Demand")
     promo_compare = df_demand.groupby("promo_flag")["units_sold"].mean().reset_index()